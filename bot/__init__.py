@@ -1,11 +1,53 @@
+from pathlib import Path
+
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from config import settings
-
-bot = Bot(
-    token=settings.BOT_TOKEN,
-    default=DefaultBotProperties(parse_mode="HTML"),
+from utils.tenancy import current_tenant
+from .middlewares import (
+    TenantMiddleware,
+    UpdateQueueMiddleware,
+    UpdateRecorder,
+    UserContextMiddleware,
 )
+
+# One bot per tenant; all of them are polled by the same dispatcher
+bots: dict[str, Bot] = {
+    tenant.NAME: Bot(
+        token=tenant.BOT_TOKEN,
+        default=DefaultBotProperties(parse_mode="HTML"),
+    )
+    for tenant in settings.TENANTS
+}
+
+
+def get_bot() -> Bot:
+    """Return the bot of the current tenant."""
+    return bots[current_tenant.get()]
+
+
 dp = Dispatcher(storage=MemoryStorage())
+# First, so updates are recorded in arrival order before the queue reorders them
+recorder: UpdateRecorder | None = None
+if settings.RECORD_UPDATES:
+    recorder = UpdateRecorder(
+        Path(settings.RECORD_UPDATES),
+        {b.id: name for name, b in bots.items()},
+        {tenant.NAME: set(tenant.ADMIN_IDS) for tenant in settings.TENANTS},
+    )
+    dp.update.outer_middleware(recorder)
+    dp.shutdown.register(recorder.close)
+update_queue = UpdateQueueMiddleware(
+    max_concurrency=settings.UPDATE_CONCURRENCY,
+    max_user_queue=settings.USER_QUEUE_SIZE,
+    max_pending=settings.UPDATE_QUEUE_SIZE,
+)
+dp.update.outer_middleware(update_queue)
+# Registered after the queue so it runs inside the worker that handles the update
+dp.update.outer_middleware(TenantMiddleware({b.id: name for name, b in bots.items()}))
+# Inner middlewares on the dispatcher also apply to every included router
+user_context = UserContextMiddleware()
+dp.message.middleware(user_context)
+dp.callback_query.middleware(user_context)
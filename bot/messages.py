@@ -9,17 +9,34 @@ ADMIN_ONLY = "No tienes permiso para usar este comando"
 INVALID_TOKEN = "Token inválido"
 
 # Usage strings
-GEN_TOKEN_USAGE = "Uso: /gen_token &lt;días&gt;"
+GEN_TOKEN_USAGE = "Uso: /gen_token &lt;días&gt; [horas de validez, 0 = sin caducidad]"
 TOKEN_USAGE = "Uso: /join &lt;token&gt;"
-BROADCAST_USAGE = "Uso: /broadcast &lt;texto&gt;"
+BROADCAST_USAGE = (
+    "Uso: /broadcast &lt;texto&gt;\n"
+    "O responde con /broadcast a una foto, vídeo, documento o álbum para reenviarlo"
+)
 ADD_SUB_USAGE = "Uso: /add_sub &lt;@user&gt; &lt;días&gt;"
 REMOVE_SUB_USAGE = "Uso: /remove_sub &lt;@user&gt;"
+BULK_SUB_USAGE = (
+    "Uso: envía un archivo CSV con /bulk_sub como pie (o responde a él con /bulk_sub).\n"
+    "Cada fila: &lt;@user o ID&gt;,&lt;días&gt; (0 o remove para eliminar)"
+)
+BULK_SUB_ENCODING = (
+    "No se pudo leer el archivo: guárdalo como CSV con codificación UTF-8 "
+    "(en Excel, «CSV UTF-8»)"
+)
+BULK_SUB_TOO_LARGE = "El archivo es demasiado grande (máximo {limit} MB)"
 SET_REMINDER_USAGE = "Uso: /set_reminder &lt;texto&gt;"
 SET_EXPIRATION_USAGE = "Uso: /set_expiration &lt;texto&gt;"
-SET_PRICE_USAGE = "Uso: /set_price &lt;periodo&gt; &lt;cantidad&gt;"
+SET_PRICE_USAGE = (
+    "Uso: /set_price &lt;periodo&gt; &lt;cantidad&gt; [moneda]\n"
+    "Periodos: 1d, 1w, 2w, 1m, perm o &lt;n&gt;d"
+)
+EXPORT_USAGE = "Uso: /export [users|subscriptions|tokens] [gz]"
 
 # Success / info messages
 TOKEN_GENERATED = "Token generado: <code>{token}</code>"
+TOKEN_EXPIRES = "Caduca en {hours} h si no se usa"
 SUB_ACTIVATED = "Suscripción activada por {duration} días"
 SUB_ACTIVATED_WITH_LINK = (
     "Suscripción activada por {duration} días.\nInvitación: {invite}"
@@ -30,10 +47,43 @@ SUBSCRIPTION_MENU = "Menú de suscripción"
 NOT_REGISTERED = (
     "No estás registrado. Solicita un token y envía /start &lt;token&gt; para suscribirte."
 )
-BROADCAST_SENT = "Mensaje enviado a {count} usuarios"
+BROADCAST_SENT = "Mensaje enviado a {count} usuarios ({failed} fallidos)"
+BROADCAST_STARTED = "Enviando a los suscriptores..."
+BROADCAST_FAILED = "El envío se interrumpió por un error; revisa el registro del bot"
+SCHEDULE_BROADCAST_USAGE = (
+    "Uso: /schedule_broadcast &lt;HH:MM&gt; [AAAA-MM-DD] &lt;texto&gt;\n"
+    "También puedes responder con el comando a una foto, vídeo, documento o álbum. "
+    "La hora es la local de cada suscriptor."
+)
+SCHEDULE_BROADCAST_DONE = (
+    "Difusión #{id} programada para {count} suscriptores a las {time} (hora local).\n"
+    "Envíos entre {first} y {last} UTC"
+)
+SCHEDULE_BROADCAST_EMPTY = "No hay suscriptores activos a los que enviar"
+TIMEZONE_CURRENT = (
+    "Tu zona horaria: {timezone}\n"
+    "Cámbiala con /timezone &lt;zona&gt;, por ejemplo /timezone Europe/Madrid "
+    "(/timezone reset para volver a la predeterminada)"
+)
+TIMEZONE_SET = "Zona horaria actualizada: {timezone}"
+TIMEZONE_INVALID = "Zona horaria desconocida: {timezone}. Usa un nombre como America/Mexico_City"
+TIMEZONE_DEFAULT = "la predeterminada del bot"
 USER_NOT_FOUND = "Usuario no encontrado"
+FIND_USAGE = "Uso: /find &lt;nombre, @usuario o ID&gt;"
+FIND_EMPTY = "No se encontraron usuarios para «{query}»"
+FIND_HEADER = "Resultados para «{query}» (página {page}):"
+FIND_ROW = "<code>{id}</code> {name}{username} — {status}"
+FIND_STATUS_ACTIVE = "activa hasta {end}"
+FIND_STATUS_EXPIRED = "expirada el {end}"
+FIND_STATUS_NONE = "sin suscripción"
 SUB_ADDED = "Suscripción añadida por {days} días para @{username}"
 SUB_REMOVED = "Suscripción eliminada para @{username}"
+BULK_SUB_DONE = (
+    "Carga masiva completada\n"
+    "Concedidas: {granted}\nEliminadas: {revoked}\nNo procesadas: {rejected}\n"
+    "Tiempos: lectura {parse:.0f} ms, búsqueda {lookup:.0f} ms, "
+    "aplicación {apply:.0f} ms, total {total:.0f} ms"
+)
 REMINDER_UPDATED = "Mensaje de recordatorio actualizado"
 EXPIRATION_UPDATED = "Mensaje de expiración actualizado"
 # Admin menus
@@ -50,19 +100,30 @@ BOLD_STATS = (
     "\u2705 Active: {active}\n"
     "\u274c Expired: {expired}\n"
     "\ud83d\udd01 Renewals: {renewals}\n"
+    "\ud83d\udcc9 Churn (30d): {churn}\n"
     "\ud83d\udcc5 Most popular period: {period}\n"
     "\ud83d\udcb0 Estimated revenue: {revenue} {currency}\n"
     "\ud83d\udd54 Local time: {time} ({tz})\n"
     "\ud83d\udcb1 Currency: {currency}"
 )
 BROADCAST_INSTRUCTIONS = (
-    "Envía /broadcast &lt;texto&gt; para enviar un mensaje a todos los suscriptores"
+    "Envía /broadcast &lt;texto&gt; para enviar un mensaje a todos los suscriptores, "
+    "o responde con /broadcast a una foto, vídeo, documento o álbum"
 )
 ACCESS_LINK = "Enlace de acceso: {link}"
 SUBSCRIBER_INFO = (
     "Usuario {user_id}\nInicio: {start}\nExpira: {end}\nTotal: {days} días\nRenovaciones: {renewals}"
 )
 USER_REMOVED = "Usuario {user_id} eliminado"
+QUEUE_STATS = (
+    "En proceso: {in_flight}\nEn cola: {queued}\nUsuarios con cola: {active_users}\n"
+    "Cola más larga: {max_user_depth} (máx. histórico {peak_user_depth})\n"
+    "Procesadas: {processed}\nFallidas: {failed}\nDescartadas: {dropped}"
+)
+BACKUP_STARTED = "Creando copia de seguridad..."
+BACKUP_DONE = "Copia creada: {name} ({size} KB, {pages} páginas) en {elapsed:.1f} s"
+BACKUP_CORRUPT = "La copia no superó la verificación de integridad: {integrity}"
+BACKUP_FAILED = "No se pudo crear la copia de seguridad: {error}"
 PRICE_SELECT_PERIOD = "Selecciona el período de suscripción"
 PRICE_ENTER_AMOUNT = "Ingresa el precio para este período (solo números, p. ej. 10):"
 
@@ -0,0 +1,11 @@
+from .recorder import UpdateRecorder
+from .tenant import TenantMiddleware
+from .update_queue import UpdateQueueMiddleware
+from .user_context import UserContextMiddleware
+
+__all__ = [
+    "TenantMiddleware",
+    "UpdateQueueMiddleware",
+    "UpdateRecorder",
+    "UserContextMiddleware",
+]
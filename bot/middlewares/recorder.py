@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from pathlib import Path
+from typing import IO, Any, Awaitable, Callable, Iterator
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import TelegramObject, Update
+
+__all__ = ["UpdateRecorder", "read_records"]
+
+logger = logging.getLogger(__name__)
+
+# Seconds between flushes of the log file
+FLUSH_INTERVAL = 1.0
+
+# Keys holding personal data that handlers never need
+_DROPPED_KEYS = {"last_name", "phone_number", "bio", "contact", "location", "venue"}
+
+# Bot-authored text (search results, subscriber cards) quotes other users' details
+_BOT_TEXT_KEYS = {"text", "entities", "caption", "caption_entities"}
+
+# Callback data of the form "<prefix>:<user id>"
+_USER_ID_CALLBACKS = {"remove_user"}
+
+
+def _open(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_records(path: Path) -> Iterator[dict[str, Any]]:
+    """Yield the records of a log written by :class:`UpdateRecorder`, in order."""
+    with _open(path, "r") as log:
+        for line in log:
+            if line.strip():
+                yield json.loads(line)
+
+
+class UpdateRecorder(BaseMiddleware):
+    """Outer update middleware appending every update to a JSONL log.
+
+    Each line holds the receive time, the tenant, whether the sender is one
+    of its admins and the update as sent by Telegram. User IDs are replaced
+    by keyed hashes that are stable within one log but can't be reversed
+    once the process exits; names and usernames are derived from them and
+    contact details are dropped. User IDs in button callback data are
+    mapped the same way, and the text of messages sent by the bot (which
+    may list other users) is dropped. Group and channel IDs, the text users
+    send and Telegram's own timestamps are kept. A ``.gz`` path writes gzip.
+    """
+
+    def __init__(
+        self, path: Path, tenant_by_bot_id: dict[int, str], admin_ids: dict[str, set[int]]
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._log = _open(path, "a")
+        self._tenant_by_bot_id = tenant_by_bot_id
+        self._admin_ids = admin_ids
+        self._key = secrets.token_bytes(16)
+        self._last_flush = time.monotonic()
+        self.recorded = 0
+
+    def _pseudonym(self, user_id: int) -> int:
+        digest = hmac.new(self._key, str(user_id).encode(), hashlib.sha256).digest()
+        # Positive and below 2**40, like real user IDs
+        return int.from_bytes(digest[:5], "big") or 1
+
+    def _callback_data(self, value: str) -> str:
+        prefix, sep, arg = value.partition(":")
+        if sep and prefix in _USER_ID_CALLBACKS and arg.isdigit():
+            return f"{prefix}:{self._pseudonym(int(arg))}"
+        return value
+
+    def _anonymize(self, value: Any) -> Any:
+        if isinstance(value, list):
+            return [self._anonymize(item) for item in value]
+        if not isinstance(value, dict):
+            return value
+        result = {k: self._anonymize(v) for k, v in value.items() if k not in _DROPPED_KEYS}
+        # Users (first_name) and private chats (positive id) share the user's ID
+        user_id = result.get("id")
+        if isinstance(user_id, int) and user_id > 0 and ("first_name" in result or "type" in result):
+            pseudonym = self._pseudonym(user_id)
+            result["id"] = pseudonym
+            if "first_name" in result:
+                result["first_name"] = f"User {pseudonym}"
+            if "username" in result:
+                result["username"] = f"user{pseudonym}"
+        if isinstance(result.get("user_chat_id"), int):
+            result["user_chat_id"] = self._pseudonym(result["user_chat_id"])
+        for key in ("data", "callback_data"):
+            if isinstance(result.get(key), str):
+                result[key] = self._callback_data(result[key])
+        sender = result.get("from")
+        if isinstance(sender, dict) and sender.get("is_bot"):
+            for key in _BOT_TEXT_KEYS:
+                result.pop(key, None)
+        return result
+
+    def _write(self, update: Update, bot: Bot, data: dict[str, Any]) -> None:
+        tenant = self._tenant_by_bot_id.get(bot.id)
+        user = data.get("event_from_user")
+        record = {
+            "ts": round(time.time(), 3),
+            "tenant": tenant,
+            "admin": user is not None and user.id in self._admin_ids.get(tenant, set()),
+            "update": self._anonymize(
+                update.model_dump(mode="json", by_alias=True, exclude_none=True)
+            ),
+        }
+        self._log.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.recorded += 1
+        now = time.monotonic()
+        if now - self._last_flush >= FLUSH_INTERVAL:
+            self._log.flush()
+            self._last_flush = now
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        try:
+            self._write(event, data["bot"], data)
+        except Exception:
+            # Recording must never cost an update
+            logger.exception("Could not record update %s", getattr(event, "update_id", "?"))
+        return await handler(event, data)
+
+    def close(self) -> None:
+        """Flush and close the log."""
+        self._log.close()
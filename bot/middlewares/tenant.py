@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.types import TelegramObject
+
+from utils.tenancy import tenant_scope
+
+__all__ = ["TenantMiddleware"]
+
+
+class TenantMiddleware(BaseMiddleware):
+    """Run each update in the scope of the tenant owning the receiving bot."""
+
+    def __init__(self, tenant_by_bot_id: dict[int, str]) -> None:
+        self._tenant_by_bot_id = tenant_by_bot_id
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        bot: Bot = data["bot"]
+        with tenant_scope(self._tenant_by_bot_id[bot.id]):
+            return await handler(event, data)
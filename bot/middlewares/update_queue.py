@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+__all__ = ["UpdateQueueMiddleware"]
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]]
+
+
+@dataclass
+class _UserQueue:
+    items: deque[tuple[Handler, Update, dict[str, Any]]] = field(default_factory=deque)
+    worker: asyncio.Task | None = None
+
+
+class UpdateQueueMiddleware(BaseMiddleware):
+    """Outer update middleware running handlers through per-user queues.
+
+    Updates from the same user run one after another in arrival order,
+    different users run in parallel, and at most ``max_concurrency``
+    handlers run at once. Once ``max_pending`` updates are queued the
+    middleware stops returning until there is room, which stalls polling
+    instead of piling up tasks. A user whose queue already holds
+    ``max_user_queue`` updates has further ones dropped, so one flooding
+    or slow user never holds up everybody else's updates. Use with
+    ``start_polling(handle_as_tasks=False)``.
+    """
+
+    def __init__(
+        self, max_concurrency: int = 16, max_user_queue: int = 10, max_pending: int = 1000
+    ) -> None:
+        self._running = asyncio.Semaphore(max_concurrency)
+        self._capacity = asyncio.Semaphore(max_pending)
+        self._max_user_queue = max_user_queue
+        self._queues: dict[tuple[int, int | None], _UserQueue] = {}
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.peak_user_depth = 0
+
+    async def __call__(
+        self, handler: Handler, event: TelegramObject, data: dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        # The same person talking to two tenant bots gets two independent queues
+        key = (data["bot"].id, user.id if user is not None else None)
+
+        queue = self._queues.get(key)
+        if queue is not None and len(queue.items) >= self._max_user_queue:
+            # Waiting for this user's queue here would stall polling for every user
+            self.dropped += 1
+            logger.warning(
+                "Dropped update %s: queue of user %s is full",
+                getattr(event, "update_id", "?"),
+                key[1],
+            )
+            return None
+
+        await self._capacity.acquire()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = _UserQueue()
+        queue.items.append((handler, event, data))
+        self.peak_user_depth = max(self.peak_user_depth, len(queue.items))
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._drain(key, queue))
+        return None
+
+    async def _drain(self, key: tuple[int, int | None], queue: _UserQueue) -> None:
+        while queue.items:
+            async with self._running:
+                handler, event, data = queue.items.popleft()
+                self.in_flight += 1
+                try:
+                    await handler(event, data)
+                except Exception:
+                    self.failed += 1
+                    logger.exception(
+                        "Error processing update %s", getattr(event, "update_id", "?")
+                    )
+                finally:
+                    self.in_flight -= 1
+                    self.processed += 1
+                    self._capacity.release()
+        queue.worker = None
+        if self._queues.get(key) is queue:
+            del self._queues[key]
+
+    def stats(self) -> dict[str, int]:
+        """Return current queue-depth and throughput counters."""
+        depths = [len(q.items) for q in self._queues.values()]
+        return {
+            "in_flight": self.in_flight,
+            "queued": sum(depths),
+            "active_users": len(depths),
+            "max_user_depth": max(depths, default=0),
+            "peak_user_depth": self.peak_user_depth,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+        }
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.types import TelegramObject, User
+
+from services.user_service import load_user_context
+
+__all__ = ["UserContextMiddleware"]
+
+
+class UserContextMiddleware(BaseMiddleware):
+    """Inject the sender's :class:`~database.models.UserContext` as ``user_context``.
+
+    Register as an inner middleware so it only runs once a handler has
+    matched; the context is only loaded for handlers that take a
+    ``user_context`` argument.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        user: User | None = data.get("event_from_user")
+        target: HandlerObject | None = data.get("handler")
+        if user is not None and target is not None and "user_context" in target.params:
+            data["user_context"] = await load_user_context(user)
+        return await handler(event, data)
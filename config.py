@@ -1,15 +1,72 @@
 from dataclasses import dataclass, field
+import json
 import os
 from dotenv import load_dotenv
 
+from utils.tenancy import DEFAULT_TENANT, current_tenant
+
 load_dotenv()
 
+
+@dataclass
+class TenantSettings:
+    """Settings of one bot/community hosted by the process."""
+
+    NAME: str
+    BOT_TOKEN: str
+    ADMIN_IDS: list[int]
+    DB_PATH: str = "db.sqlite3"
+    CHANNEL_ID: int | None = None
+
+
 @dataclass
 class Settings:
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     ADMIN_IDS: list[int] = field(default_factory=list)
+    CHANNEL_ID: int | None = None
+    TENANTS_FILE: str = os.getenv("TENANTS_FILE", "")
+    TENANTS: list[TenantSettings] = field(default_factory=list)
+    INVITE_POOL_SIZE: int = 20
+    INVITE_LINK_TTL_HOURS: int = 24
+    UPDATE_CONCURRENCY: int = 16
+    USER_QUEUE_SIZE: int = 10
+    UPDATE_QUEUE_SIZE: int = 1000
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", "backups")
+    BACKUP_INTERVAL_HOURS: int = 24
+    BACKUP_KEEP: int = 7
+    BACKUP_COMPRESS: bool = os.getenv("BACKUP_COMPRESS", "").lower() in ("1", "true", "yes")
+    TOKEN_TTL_HOURS: int = 0
+    TOKEN_RETENTION_DAYS: int = 30
+    BROADCAST_SLOT_CAPACITY: int = 600
+    USER_CONTEXT_TTL: int = 30
+    # Optional JSONL (or .jsonl.gz) file receiving every update, anonymized
+    RECORD_UPDATES: str = os.getenv("RECORD_UPDATES", "")
 
     def __post_init__(self) -> None:
+        if self.TENANTS_FILE:
+            self.TENANTS = self._load_tenants(self.TENANTS_FILE)
+        else:
+            self._load_single_tenant()
+
+        for name in (
+            "INVITE_POOL_SIZE",
+            "INVITE_LINK_TTL_HOURS",
+            "UPDATE_CONCURRENCY",
+            "USER_QUEUE_SIZE",
+            "UPDATE_QUEUE_SIZE",
+            "BACKUP_INTERVAL_HOURS",
+            "BACKUP_KEEP",
+            "TOKEN_TTL_HOURS",
+            "TOKEN_RETENTION_DAYS",
+            "BROADCAST_SLOT_CAPACITY",
+            "USER_CONTEXT_TTL",
+        ):
+            try:
+                setattr(self, name, int(os.getenv(name, getattr(self, name))))
+            except ValueError:
+                raise RuntimeError(f"{name} must be an integer")
+
+    def _load_single_tenant(self) -> None:
         if not self.BOT_TOKEN:
             raise RuntimeError(
                 "BOT_TOKEN environment variable is not set. "
@@ -29,4 +86,62 @@ class Settings:
                 "Specify at least one admin Telegram ID before running the bot."
             )
 
+        channel_id = os.getenv("CHANNEL_ID", "").strip()
+        if channel_id:
+            try:
+                self.CHANNEL_ID = int(channel_id)
+            except ValueError:
+                raise RuntimeError("CHANNEL_ID must be the numeric ID of the private channel")
+
+        self.TENANTS = [
+            TenantSettings(
+                NAME=DEFAULT_TENANT,
+                BOT_TOKEN=self.BOT_TOKEN,
+                ADMIN_IDS=self.ADMIN_IDS,
+                CHANNEL_ID=self.CHANNEL_ID,
+            )
+        ]
+
+    @staticmethod
+    def _load_tenants(path: str) -> list[TenantSettings]:
+        """Read a JSON list of ``{name, bot_token, admin_ids, db_path, channel_id}``."""
+        try:
+            with open(path, encoding="utf-8") as fh:
+                entries = json.load(fh)
+            tenants = [
+                TenantSettings(
+                    NAME=str(entry["name"]),
+                    BOT_TOKEN=str(entry["bot_token"]),
+                    ADMIN_IDS=[int(x) for x in entry["admin_ids"]],
+                    DB_PATH=str(entry.get("db_path") or f"data/{entry['name']}.sqlite3"),
+                    CHANNEL_ID=(
+                        int(entry["channel_id"]) if entry.get("channel_id") is not None else None
+                    ),
+                )
+                for entry in entries
+            ]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            raise RuntimeError(f"Invalid TENANTS_FILE {path}: {exc}")
+        if not tenants:
+            raise RuntimeError(f"TENANTS_FILE {path} does not define any bot")
+        if len({t.NAME for t in tenants}) != len(tenants):
+            raise RuntimeError(f"TENANTS_FILE {path} has duplicate tenant names")
+        if len({os.path.abspath(t.DB_PATH) for t in tenants}) != len(tenants):
+            raise RuntimeError(f"TENANTS_FILE {path} gives several tenants the same db_path")
+        if any(not t.ADMIN_IDS for t in tenants):
+            raise RuntimeError(f"Every tenant in {path} needs at least one admin ID")
+        return tenants
+
+    def tenant(self, name: str) -> TenantSettings:
+        """Return the settings of the tenant called ``name``."""
+        for tenant in self.TENANTS:
+            if tenant.NAME == name:
+                return tenant
+        raise KeyError(name)
+
+    @property
+    def current(self) -> TenantSettings:
+        """Settings of the tenant the running code works for."""
+        return self.tenant(current_tenant.get())
+
 settings = Settings()
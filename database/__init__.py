@@ -1,25 +1,260 @@
 import aiosqlite
+import logging
+import sqlite3
+from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Iterable, Sequence, TypeVar
 
-from .models import SCHEMA
+from utils.tenancy import current_tenant
 
-_db: aiosqlite.Connection | None = None
+from .models import SCHEMA, SEARCH_SCHEMA
+from .repository import Repository, SQLiteRepository, run_in_thread
+
+logger = logging.getLogger(__name__)
+
+# One connection per tenant database, shared by everything in the process
+_pool: dict[str, aiosqlite.Connection] = {}
+_paths: dict[str, str] = {}
+_repositories: dict[str, Repository] = {}
+
+T = TypeVar("T")
+
+# Span of a subscription in whole days; exact unless it was extended
+_SUBSCRIPTION_SPAN = "CAST(ROUND(julianday(end_date)-julianday(start_date)) AS INTEGER)"
+
+# Columns added after a table's first release: (table, column, definition,
+# backfills). The first backfill that runs wins; later ones are fallbacks
+# for databases missing a table the earlier ones read.
+_COLUMN_MIGRATIONS: list[tuple[str, str, str, tuple[str, ...]]] = [
+    # Days of the latest grant from the history, or the subscription's span
+    # when there is no history (e.g. the history table is created later,
+    # by SCHEMA, on databases from before it existed)
+    (
+        "subscription",
+        "duration_days",
+        "INTEGER NOT NULL DEFAULT 0",
+        (
+            "UPDATE subscription SET duration_days=COALESCE(("
+            "SELECT e.duration_days FROM subscription_event e "
+            "WHERE e.user_id=subscription.user_id AND e.event IN ('created', 'extended') "
+            f"ORDER BY e.id DESC LIMIT 1), {_SUBSCRIPTION_SPAN})",
+            f"UPDATE subscription SET duration_days={_SUBSCRIPTION_SPAN}",
+        ),
+    ),
+    # Tokens from before these columns count as created, and used, at migration time
+    (
+        "token",
+        "created_at",
+        "TEXT",
+        ("UPDATE token SET created_at=strftime('%Y-%m-%dT%H:%M:%S', 'now')",),
+    ),
+    ("token", "expires_at", "TEXT", ()),
+    ("token", "used_at", "TEXT", ("UPDATE token SET used_at=created_at WHERE used=1",)),
+    ("user", "timezone", "TEXT", ()),
+]
+
+
+async def _migrate_user_username(db: aiosqlite.Connection) -> None:
+    """Make ``user.username`` nullable so users without one don't collide."""
+    async with db.execute("PRAGMA table_info(user)") as cur:
+        columns = {row["name"]: row for row in await cur.fetchall()}
+    if "username" not in columns or not columns["username"]["notnull"]:
+        return
+    await db.executescript(
+        """
+        BEGIN;
+        CREATE TABLE user_new (
+            id INTEGER PRIMARY KEY,
+            username TEXT UNIQUE,
+            full_name TEXT NOT NULL,
+            is_admin INTEGER NOT NULL DEFAULT 0
+        );
+        INSERT INTO user_new (id, username, full_name, is_admin)
+            SELECT id, NULLIF(username, ''), full_name, is_admin FROM user;
+        DROP TABLE user;
+        ALTER TABLE user_new RENAME TO user;
+        COMMIT;
+        """
+    )
+
+
+async def _migrate(db: aiosqlite.Connection) -> None:
+    """Bring tables created by an older schema up to date."""
+    await _migrate_user_username(db)
+    for table, column, definition, backfills in _COLUMN_MIGRATIONS:
+        async with db.execute(f"PRAGMA table_info({table})") as cur:
+            columns = {row["name"] for row in await cur.fetchall()}
+        if not columns or column in columns:
+            continue
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        error = None
+        for backfill in backfills:
+            try:
+                await db.execute(backfill)
+                break
+            except aiosqlite.OperationalError as exc:
+                # e.g. the backfill reads a table this database doesn't have yet
+                error = exc
+        else:
+            if error is not None:
+                logger.warning("Skipped backfill of %s.%s: %s", table, column, error)
+
+
+async def _create_search_index(db: aiosqlite.Connection) -> bool:
+    """Create the FTS5 user index, filling it from existing users the first time.
+
+    Returns False when SQLite lacks FTS5; user search then falls back to
+    scanning names with LIKE.
+    """
+    async with db.execute("SELECT 1 FROM sqlite_master WHERE name='user_fts'") as cur:
+        existed = await cur.fetchone() is not None
+    try:
+        await db.executescript(SEARCH_SCHEMA)
+    except aiosqlite.OperationalError as exc:
+        logger.warning("Full-text user search unavailable: %s", exc)
+        return False
+    if not existed:
+        await db.execute("INSERT INTO user_fts (user_fts) VALUES ('rebuild')")
+    return True
+
+
+async def _enable_incremental_vacuum(db: aiosqlite.Connection) -> None:
+    """Switch to ``auto_vacuum=INCREMENTAL`` so freed pages can be reclaimed.
+
+    The mode only takes effect on existing files after a full VACUUM,
+    which runs once here; afterwards :func:`incremental_vacuum` trims the
+    file a few pages at a time.
+    """
+    async with db.execute("PRAGMA auto_vacuum") as cur:
+        row = await cur.fetchone()
+    if row[0] == 2:
+        return
+    await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    await db.execute("VACUUM")
+
+
+def _incremental_vacuum_sync(conn: sqlite3.Connection, pages: int) -> int:
+    # Through the sqlite3 module each execution frees a single page, whatever
+    # the argument. executescript would run it to completion but first commits
+    # whatever transaction other coroutines have open on this connection.
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    for _ in range(min(pages, free)):
+        conn.execute("PRAGMA incremental_vacuum(1)")
+    return int(conn.execute("PRAGMA freelist_count").fetchone()[0])
+
+
+async def incremental_vacuum(pages: int = 1000) -> int:
+    """Return up to ``pages`` free pages of the current tenant's file to the OS.
+
+    Returns how many free pages are left.
+    """
+    return await run_batch(_incremental_vacuum_sync, int(pages))
 
 
 async def init_db(path: str = "db.sqlite3") -> aiosqlite.Connection:
-    """Initialize the SQLite database and return the connection."""
-    global _db
-    if _db is None:
+    """Initialize the current tenant's SQLite database and return the connection."""
+    tenant = current_tenant.get()
+    db = _pool.get(tenant)
+    if db is None:
         Path(path).parent.mkdir(parents=True, exist_ok=True)
-        _db = await aiosqlite.connect(path)
-        _db.row_factory = aiosqlite.Row
-        await _db.executescript(SCHEMA)
-        await _db.commit()
-    return _db
+        db = await aiosqlite.connect(path)
+        db.row_factory = aiosqlite.Row
+        await _enable_incremental_vacuum(db)
+        # WAL lets snapshot readers run alongside the main connection's writes
+        await db.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode NORMAL only syncs at checkpoints; a power cut may drop the
+        # last commits but never corrupts the file, and commits stop paying an fsync
+        await db.execute("PRAGMA synchronous=NORMAL")
+        await _migrate(db)
+        await db.executescript(SCHEMA)
+        searchable = await _create_search_index(db)
+        await db.commit()
+        _pool[tenant] = db
+        _paths[tenant] = path
+        _repositories.setdefault(tenant, SQLiteRepository(db, full_text=searchable))
+    return db
 
 
 def get_db() -> aiosqlite.Connection:
-    """Return the initialized database connection."""
-    if _db is None:
+    """Return the current tenant's database connection."""
+    db = _pool.get(current_tenant.get())
+    if db is None:
+        raise RuntimeError("Database not initialized")
+    return db
+
+
+async def run_batch(fn: Callable[..., T], *args: Any) -> T:
+    """Run ``fn(conn, *args)`` on the current tenant's connection thread.
+
+    ``conn`` is the plain sqlite3 connection, so ``fn`` can run several
+    statements and commit (e.g. inside ``with conn:``) for the cost of a
+    single await instead of one per statement.
+
+    All writes on the shared connection go through here (or
+    :func:`run_write`) and finish their transaction before returning.
+    ``with conn:`` commits or rolls back whatever transaction is open on
+    the connection, so a write left uncommitted across an await would be
+    committed, or discarded, by whichever batch runs next.
+    """
+    return await run_in_thread(get_db(), fn, *args)
+
+
+def _write_sync(conn: sqlite3.Connection, sql: str, rows: list[Sequence[Any]]) -> int:
+    with conn:
+        return conn.executemany(sql, rows).rowcount
+
+
+async def run_write(sql: str, rows: Iterable[Sequence[Any]]) -> int:
+    """Run write statement ``sql`` once per parameter row and commit.
+
+    Returns the number of rows changed.
+    """
+    return await run_batch(_write_sync, sql, list(rows))
+
+
+def get_repository() -> Repository:
+    """Return the current tenant's repository."""
+    repo = _repositories.get(current_tenant.get())
+    if repo is None:
         raise RuntimeError("Database not initialized")
-    return _db
+    return repo
+
+
+def use_repository(repo: Repository) -> None:
+    """Make ``repo`` the current tenant's repository, e.g. an in-memory one."""
+    _repositories[current_tenant.get()] = repo
+
+
+def get_db_path() -> str:
+    """Return the file path of the current tenant's database."""
+    path = _paths.get(current_tenant.get())
+    if path is None:
+        raise RuntimeError("Database not initialized")
+    return path
+
+
+async def close_all() -> None:
+    """Close every tenant's connection."""
+    while _pool:
+        _, db = _pool.popitem()
+        await db.close()
+    _paths.clear()
+    _repositories.clear()
+
+
+@asynccontextmanager
+async def open_snapshot(iter_chunk_size: int = 500) -> AsyncIterator[aiosqlite.Connection]:
+    """Yield a read-only connection holding a single consistent snapshot.
+
+    The connection runs on its own thread, so long scans don't queue behind
+    (or in front of) the handlers using :func:`get_db`.
+    """
+    uri = f"{Path(get_db_path()).resolve().as_uri()}?mode=ro"
+    conn = await aiosqlite.connect(uri, uri=True, iter_chunk_size=iter_chunk_size)
+    conn.row_factory = aiosqlite.Row
+    try:
+        await conn.execute("BEGIN")
+        yield conn
+    finally:
+        await conn.rollback()
+        await conn.close()
@@ -0,0 +1,206 @@
+import datetime
+import heapq
+from typing import AsyncIterator, Iterable, Optional, Sequence
+
+from .models import Subscription, SubscriptionEvent, Token, User, UserContext, UserMatch
+from .repository import Grant, Repository, extend_subscription, search_terms
+
+__all__ = ["MemoryRepository"]
+
+
+class MemoryRepository(Repository):
+    """Repository keeping everything in dicts, for tests and benchmarks.
+
+    Subscriptions are also indexed by a min-heap on end date, so expiry
+    scans only touch the subscriptions that are actually due. Heap entries
+    are dropped lazily once their subscription changes or goes away.
+
+    Only the :class:`Repository` contract is covered; invite links, prices,
+    stats, exports and the kick queue still run SQL through ``get_db()``.
+    """
+
+    def __init__(self) -> None:
+        self.users: dict[int, User] = {}
+        self.usernames: dict[str, int] = {}
+        self.subscriptions: dict[int, Subscription] = {}
+        self.events: list[SubscriptionEvent] = []
+        self.tokens: dict[str, Token] = {}
+        self.config: dict[str, str] = {}
+        self._by_end: list[tuple[datetime.datetime, int]] = []
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        return self.users.get(user_id)
+
+    async def get_user_context(self, user_id: int) -> Optional[UserContext]:
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        sub = self.subscriptions.get(user_id)
+        return UserContext(user.id, user.is_admin, user.timezone, sub.end_date if sub else None)
+
+    async def iter_users(self) -> AsyncIterator[User]:
+        for user in list(self.users.values()):
+            yield user
+
+    async def count_users(self) -> int:
+        return len(self.users)
+
+    async def upsert_user(self, user_id: int, username: Optional[str], full_name: str) -> None:
+        user = self.users.get(user_id)
+        if user is None:
+            user = self.users[user_id] = User(user_id, None, full_name, False)
+        if user.username is not None:
+            self.usernames.pop(user.username, None)
+        if username is not None:
+            previous = self.usernames.get(username)
+            if previous is not None and previous != user_id:
+                self.users[previous].username = None
+            self.usernames[username] = user_id
+        user.username = username
+        user.full_name = full_name
+
+    async def set_user_timezone(self, user_id: int, timezone: Optional[str]) -> None:
+        if user_id in self.users:
+            self.users[user_id].timezone = timezone
+
+    async def set_admins(self, user_ids: Iterable[int]) -> None:
+        for user_id in user_ids:
+            user = self.users.setdefault(user_id, User(user_id, None, str(user_id), False))
+            user.is_admin = True
+
+    async def search_users(self, query: str, limit: int, offset: int = 0) -> list[UserMatch]:
+        terms, user_id = search_terms(query)
+        if not terms:
+            return []
+        matches = []
+        for user in self.users.values():
+            words = search_terms(f"{user.username or ''} {user.full_name}")[0]
+            if user.id == user_id or all(
+                any(word.startswith(term) for word in words) for term in terms
+            ):
+                matches.append(user)
+        matches.sort(key=lambda u: (u.id != user_id, u.id))
+        return [
+            UserMatch(u, sub.end_date if (sub := self.subscriptions.get(u.id)) else None)
+            for u in matches[offset : offset + limit]
+        ]
+
+    async def find_user_ids(self, user_ids: Iterable[int]) -> set[int]:
+        return {user_id for user_id in user_ids if user_id in self.users}
+
+    async def find_usernames(self, usernames: Iterable[str]) -> dict[str, int]:
+        return {name: self.usernames[name] for name in usernames if name in self.usernames}
+
+    async def get_subscription(self, user_id: int) -> Optional[Subscription]:
+        return self.subscriptions.get(user_id)
+
+    def _record_event(
+        self,
+        user_id: int,
+        event: str,
+        duration_days: int,
+        token: Optional[str],
+        now: datetime.datetime,
+    ) -> None:
+        self.events.append(SubscriptionEvent(user_id, event, duration_days, token, now))
+
+    async def grant_subscriptions(self, grants: Sequence[Grant], now: datetime.datetime) -> None:
+        for user_id, duration_days, token in grants:
+            sub, event = extend_subscription(
+                self.subscriptions.get(user_id), user_id, duration_days, now
+            )
+            self.subscriptions[user_id] = sub
+            heapq.heappush(self._by_end, (sub.end_date, user_id))
+            self._record_event(user_id, event, duration_days, token, now)
+
+    async def remove_subscriptions(
+        self, user_ids: Iterable[int], event: str, now: datetime.datetime
+    ) -> int:
+        removed = 0
+        for user_id in user_ids:
+            if self.subscriptions.pop(user_id, None) is not None:
+                self._record_event(user_id, event, 0, None, now)
+                removed += 1
+        return removed
+
+    def _due(self, before: datetime.datetime) -> list[Subscription]:
+        """Return live subscriptions ending at or before ``before`` via the heap."""
+        due: list[Subscription] = []
+        popped: dict[int, tuple[datetime.datetime, int]] = {}
+        while self._by_end and self._by_end[0][0] <= before:
+            entry = heapq.heappop(self._by_end)
+            sub = self.subscriptions.get(entry[1])
+            if sub is not None and sub.end_date == entry[0] and entry[1] not in popped:
+                due.append(sub)
+                popped[entry[1]] = entry
+        for entry in popped.values():
+            heapq.heappush(self._by_end, entry)
+        return due
+
+    async def iter_active_subscriptions(
+        self, now: datetime.datetime, batch_size: int
+    ) -> AsyncIterator[Subscription]:
+        for sub in list(self.subscriptions.values()):
+            if sub.end_date > now:
+                yield sub
+
+    async def count_active_subscriptions(self, now: datetime.datetime) -> int:
+        return len(self.subscriptions) - len(self._due(now))
+
+    async def count_expired_subscriptions(self, now: datetime.datetime) -> int:
+        return len(self._due(now))
+
+    async def list_expiring_subscriptions(self, before: datetime.datetime) -> list[Subscription]:
+        return self._due(before)
+
+    async def add_token(
+        self,
+        token: str,
+        duration_days: int,
+        created_at: datetime.datetime,
+        expires_at: Optional[datetime.datetime],
+    ) -> bool:
+        if token in self.tokens:
+            return False
+        self.tokens[token] = Token(token, duration_days, False, created_at, expires_at)
+        return True
+
+    async def get_token(self, token: str) -> Optional[Token]:
+        return self.tokens.get(token)
+
+    async def mark_token_used(self, token: str, now: datetime.datetime) -> None:
+        if token in self.tokens:
+            self.tokens[token].used = True
+            self.tokens[token].used_at = now
+
+    async def redeem_token(
+        self, token: str, user_id: int, now: datetime.datetime
+    ) -> Optional[int]:
+        stored = self.tokens.get(token)
+        if stored is None or stored.used:
+            return None
+        if stored.expires_at is not None and stored.expires_at <= now:
+            return None
+        stored.used = True
+        stored.used_at = now
+        await self.grant_subscriptions([(user_id, stored.duration_days, token)], now)
+        return stored.duration_days
+
+    async def delete_stale_tokens(
+        self, used_before: datetime.datetime, expired_before: datetime.datetime, limit: int
+    ) -> int:
+        stale = [
+            t.token
+            for t in self.tokens.values()
+            if (t.used and t.used_at is not None and t.used_at < used_before)
+            or (t.expires_at is not None and t.expires_at < expired_before)
+        ][:limit]
+        for token in stale:
+            del self.tokens[token]
+        return len(stale)
+
+    async def get_config(self, key: str) -> Optional[str]:
+        return self.config.get(key)
+
+    async def set_config(self, key: str, value: str) -> None:
+        self.config[key] = value
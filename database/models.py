@@ -6,17 +6,66 @@ __all__ = [
     "Subscription",
     "Token",
     "Config",
+    "SubscriptionEvent",
+    "Price",
+    "InviteLink",
+    "PendingKick",
+    "UserMatch",
+    "UserContext",
+    "ScheduledBroadcast",
+    "BroadcastDelivery",
+    "EVENT_CREATED",
+    "EVENT_EXTENDED",
+    "EVENT_EXPIRED",
+    "EVENT_REMOVED",
     "SCHEMA",
+    "SEARCH_SCHEMA",
 ]
 
+# Subscription history event types
+EVENT_CREATED = "created"
+EVENT_EXTENDED = "extended"
+EVENT_EXPIRED = "expired"
+EVENT_REMOVED = "removed"
+
 # SQLite schema definitions and data models
 
 @dataclass
 class User:
     id: int
-    username: str
+    username: str | None
     full_name: str
     is_admin: bool
+    # IANA name such as "Europe/Madrid"; None uses the bot's default
+    timezone: str | None = None
+
+
+@dataclass
+class UserMatch:
+    user: User
+    # End of the user's subscription, if they have one
+    subscription_end: datetime | None
+
+
+@dataclass
+class UserContext:
+    """What handlers need to know about the user behind an update."""
+
+    user_id: int
+    is_admin: bool
+    timezone: str | None
+    # End of the user's subscription, if they have one
+    subscription_end: datetime | None
+
+    @property
+    def active(self) -> bool:
+        return self.subscription_end is not None and self.subscription_end > datetime.utcnow()
+
+    @property
+    def role(self) -> str:
+        if self.is_admin:
+            return "admin"
+        return "subscriber" if self.active else "guest"
 
 
 @dataclass
@@ -24,6 +73,7 @@ class Subscription:
     user_id: int
     start_date: datetime
     end_date: datetime
+    duration_days: int = 0
 
 
 @dataclass
@@ -31,6 +81,9 @@ class Token:
     token: str
     duration_days: int
     used: bool
+    created_at: datetime | None = None
+    expires_at: datetime | None = None
+    used_at: datetime | None = None
 
 
 @dataclass
@@ -38,29 +91,210 @@ class Config:
     key: str
     value: str
 
+
+@dataclass
+class SubscriptionEvent:
+    user_id: int
+    event: str
+    duration_days: int
+    token: str | None
+    created_at: datetime
+
+
+@dataclass
+class Price:
+    period: str
+    currency: str
+    amount: float
+    duration_days: int
+
+
+@dataclass
+class InviteLink:
+    link: str
+    chat_id: int
+    created_at: datetime
+    expires_at: datetime
+    user_id: int | None
+    claimed_at: datetime | None
+    revoked: bool
+
+
+@dataclass
+class ScheduledBroadcast:
+    id: int
+    created_by: int
+    created_at: datetime
+    # HH:MM the message is due in each subscriber's timezone
+    local_time: str
+    text: str | None
+    from_chat_id: int | None
+    message_ids: list[int]
+
+
+@dataclass
+class BroadcastDelivery:
+    broadcast_id: int
+    user_id: int
+    due_at: datetime
+    # False once the user no longer has an active subscription
+    active: bool
+
+
+@dataclass
+class PendingKick:
+    chat_id: int
+    user_id: int
+    attempts: int
+    next_attempt_at: datetime
+
 # SQL commands to create tables
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS user (
     id INTEGER PRIMARY KEY,
-    username TEXT NOT NULL UNIQUE,
+    username TEXT UNIQUE,
     full_name TEXT NOT NULL,
-    is_admin INTEGER NOT NULL DEFAULT 0
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    timezone TEXT
 );
 
 CREATE TABLE IF NOT EXISTS subscription (
     user_id INTEGER NOT NULL REFERENCES user(id) ON DELETE CASCADE,
     start_date TEXT NOT NULL,
-    end_date TEXT NOT NULL
+    end_date TEXT NOT NULL,
+    -- Days granted by the latest grant, used to price the subscription
+    duration_days INTEGER NOT NULL DEFAULT 0
 );
 
+CREATE INDEX IF NOT EXISTS idx_subscription_user ON subscription (user_id);
+CREATE INDEX IF NOT EXISTS idx_subscription_end ON subscription (end_date);
+
 CREATE TABLE IF NOT EXISTS token (
     token TEXT PRIMARY KEY,
     duration_days INTEGER NOT NULL,
-    used INTEGER NOT NULL DEFAULT 0
+    used INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    -- NULL means the token never expires
+    expires_at TEXT,
+    used_at TEXT
 );
+-- Compaction looks up used and expired tokens by age
+CREATE INDEX IF NOT EXISTS idx_token_used_at ON token (used_at) WHERE used=1;
+CREATE INDEX IF NOT EXISTS idx_token_expires ON token (expires_at) WHERE expires_at IS NOT NULL;
 
 CREATE TABLE IF NOT EXISTS config (
     key TEXT PRIMARY KEY,
     value TEXT NOT NULL
 );
+
+CREATE TABLE IF NOT EXISTS pricing (
+    period TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    amount REAL NOT NULL,
+    duration_days INTEGER NOT NULL,
+    PRIMARY KEY (period, currency)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pricing_duration ON pricing (duration_days, currency);
+
+-- Pre-created single-use invite links; user_id is set once handed out
+CREATE TABLE IF NOT EXISTS invite_link (
+    link TEXT PRIMARY KEY,
+    chat_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    expires_at TEXT NOT NULL,
+    user_id INTEGER,
+    claimed_at TEXT,
+    revoked INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_invite_link_free
+    ON invite_link (chat_id, expires_at) WHERE user_id IS NULL AND revoked=0;
+
+-- Expired members still to be removed from the channel
+CREATE TABLE IF NOT EXISTS pending_kick (
+    chat_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (chat_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_pending_kick_due ON pending_kick (next_attempt_at);
+
+-- Append-only log of subscription state changes
+CREATE TABLE IF NOT EXISTS subscription_event (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    duration_days INTEGER NOT NULL DEFAULT 0,
+    token TEXT,
+    created_at TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_subscription_event_user
+    ON subscription_event (user_id, event);
+
+-- Broadcasts delivered at a local time; message_ids is a JSON list for copies
+CREATE TABLE IF NOT EXISTS scheduled_broadcast (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_by INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    local_time TEXT NOT NULL,
+    text TEXT,
+    from_chat_id INTEGER,
+    message_ids TEXT NOT NULL DEFAULT '[]'
+);
+
+-- One row per recipient, due_at already converted to UTC and spread into slots
+CREATE TABLE IF NOT EXISTS broadcast_delivery (
+    broadcast_id INTEGER NOT NULL REFERENCES scheduled_broadcast(id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL,
+    due_at TEXT NOT NULL,
+    sent_at TEXT,
+    PRIMARY KEY (broadcast_id, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_broadcast_delivery_due
+    ON broadcast_delivery (due_at) WHERE sent_at IS NULL;
+
+-- Daily rollup of subscription_event, maintained in the same transaction
+CREATE TABLE IF NOT EXISTS subscription_daily (
+    day TEXT NOT NULL,
+    event TEXT NOT NULL,
+    duration_days INTEGER NOT NULL DEFAULT 0,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, event, duration_days)
+);
+"""
+
+# Full-text index over user names, kept in sync with ``user`` by triggers.
+# Kept apart from SCHEMA because SQLite can be built without FTS5.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS user_fts USING fts5(
+    username,
+    full_name,
+    content='user',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS user_fts_insert AFTER INSERT ON user BEGIN
+    INSERT INTO user_fts (rowid, username, full_name)
+        VALUES (new.id, new.username, new.full_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_fts_delete AFTER DELETE ON user BEGIN
+    INSERT INTO user_fts (user_fts, rowid, username, full_name)
+        VALUES ('delete', old.id, old.username, old.full_name);
+END;
+
+CREATE TRIGGER IF NOT EXISTS user_fts_update AFTER UPDATE OF username, full_name ON user BEGIN
+    INSERT INTO user_fts (user_fts, rowid, username, full_name)
+        VALUES ('delete', old.id, old.username, old.full_name);
+    INSERT INTO user_fts (rowid, username, full_name)
+        VALUES (new.id, new.username, new.full_name);
+END;
 """
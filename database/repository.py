@@ -0,0 +1,631 @@
+import datetime
+import re
+import sqlite3
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable, Iterable, Optional, Sequence, TypeVar
+
+import aiosqlite
+
+from .models import (
+    EVENT_CREATED,
+    EVENT_EXTENDED,
+    Subscription,
+    Token,
+    User,
+    UserContext,
+    UserMatch,
+)
+
+__all__ = [
+    "Grant",
+    "Repository",
+    "SQLiteRepository",
+    "extend_subscription",
+    "run_in_thread",
+    "search_terms",
+]
+
+T = TypeVar("T")
+
+# (user_id, duration_days, token that granted the days or None)
+Grant = tuple[int, int, Optional[str]]
+
+# Stay well below SQLite's bound-parameter limit
+_LOOKUP_CHUNK = 500
+
+
+async def run_in_thread(
+    db: aiosqlite.Connection, fn: Callable[..., T], *args: Any
+) -> T:
+    """Call ``fn(conn, *args)`` with ``db``'s sqlite3 connection on its worker thread.
+
+    Every aiosqlite call (``execute``, ``fetchone``, ``commit``, closing a
+    cursor) is a separate round trip through the connection's queue, and
+    under load each one waits behind every other queued call. Running a
+    whole unit of work as one plain function costs a single trip. ``fn``
+    must only talk to SQLite; it holds up every other user of ``db``.
+    """
+    # aiosqlite has no public hook for this; _execute and _conn are what its own
+    # methods use. requirements.txt pins the version this was checked against.
+    return await db._execute(fn, db._conn, *args)
+
+
+def search_terms(query: str) -> tuple[list[str], Optional[int]]:
+    """Split a user search into lowercase, accent-free words and the user ID it may name."""
+    value = query.strip().lstrip("@")
+    user_id = int(value) if value.isdigit() else None
+    folded = "".join(
+        ch for ch in unicodedata.normalize("NFKD", value) if not unicodedata.combining(ch)
+    )
+    return [term.lower() for term in re.findall(r"\w+", folded)], user_id
+
+
+def extend_subscription(
+    current: Optional[Subscription], user_id: int, duration_days: int, now: datetime.datetime
+) -> tuple[Subscription, str]:
+    """Return the subscription after granting days and the history event.
+
+    Active subscriptions are extended from their end date, expired or
+    missing ones start over from ``now``.
+    """
+    if current is None:
+        start, end, event = now, now + datetime.timedelta(days=duration_days), EVENT_CREATED
+    elif current.end_date < now:
+        start, end, event = now, now + datetime.timedelta(days=duration_days), EVENT_EXTENDED
+    else:
+        start = current.start_date
+        end = current.end_date + datetime.timedelta(days=duration_days)
+        event = EVENT_EXTENDED
+    return Subscription(user_id, start, end, duration_days), event
+
+
+class Repository(ABC):
+    """Storage for users, subscriptions, tokens and config.
+
+    Services talk to the current tenant's repository through
+    :func:`database.get_repository`, so backends can be swapped without
+    touching them or the handlers.
+    """
+
+    # Users
+
+    @abstractmethod
+    async def get_user(self, user_id: int) -> Optional[User]:
+        """Return the user with the given ID if it exists."""
+
+    @abstractmethod
+    async def get_user_context(self, user_id: int) -> Optional[UserContext]:
+        """Return the user's role and subscription end, or None for unknown users."""
+
+    @abstractmethod
+    async def iter_users(self) -> AsyncIterator[User]:
+        """Yield every stored user."""
+
+    @abstractmethod
+    async def count_users(self) -> int:
+        """Return the number of stored users."""
+
+    @abstractmethod
+    async def upsert_user(self, user_id: int, username: Optional[str], full_name: str) -> None:
+        """Insert or rename a user, releasing ``username`` from any other user."""
+
+    @abstractmethod
+    async def set_user_timezone(self, user_id: int, timezone: Optional[str]) -> None:
+        """Store a user's IANA timezone, or clear it with None."""
+
+    @abstractmethod
+    async def set_admins(self, user_ids: Iterable[int]) -> None:
+        """Flag the given users as admins, creating placeholders for unknown IDs."""
+
+    @abstractmethod
+    async def search_users(self, query: str, limit: int, offset: int = 0) -> list[UserMatch]:
+        """Return users whose ID, username or name matches ``query``.
+
+        Each word of the query matches the start of a word in the username
+        or full name; a numeric query also matches that user ID, which is
+        listed first. Other matches are ordered by ID.
+        """
+
+    @abstractmethod
+    async def find_user_ids(self, user_ids: Iterable[int]) -> set[int]:
+        """Return which of ``user_ids`` belong to stored users."""
+
+    @abstractmethod
+    async def find_usernames(self, usernames: Iterable[str]) -> dict[str, int]:
+        """Map the stored ones among ``usernames`` to their user IDs."""
+
+    # Subscriptions
+
+    @abstractmethod
+    async def get_subscription(self, user_id: int) -> Optional[Subscription]:
+        """Return the user's subscription if it exists."""
+
+    @abstractmethod
+    async def grant_subscriptions(self, grants: Sequence[Grant], now: datetime.datetime) -> None:
+        """Add or extend subscriptions and record their history atomically."""
+
+    @abstractmethod
+    async def remove_subscriptions(
+        self, user_ids: Iterable[int], event: str, now: datetime.datetime
+    ) -> int:
+        """Delete subscriptions atomically; return how many existed."""
+
+    @abstractmethod
+    async def iter_active_subscriptions(
+        self, now: datetime.datetime, batch_size: int
+    ) -> AsyncIterator[Subscription]:
+        """Yield subscriptions ending after ``now``, ``batch_size`` at a time."""
+
+    @abstractmethod
+    async def count_active_subscriptions(self, now: datetime.datetime) -> int:
+        """Return the number of subscriptions ending after ``now``."""
+
+    @abstractmethod
+    async def count_expired_subscriptions(self, now: datetime.datetime) -> int:
+        """Return the number of subscriptions that ended at or before ``now``."""
+
+    @abstractmethod
+    async def list_expiring_subscriptions(self, before: datetime.datetime) -> list[Subscription]:
+        """Return subscriptions ending at or before ``before``, soonest first."""
+
+    # Tokens
+
+    @abstractmethod
+    async def add_token(
+        self,
+        token: str,
+        duration_days: int,
+        created_at: datetime.datetime,
+        expires_at: Optional[datetime.datetime],
+    ) -> bool:
+        """Store a new token; return False if it already exists."""
+
+    @abstractmethod
+    async def get_token(self, token: str) -> Optional[Token]:
+        """Return the token if it exists."""
+
+    @abstractmethod
+    async def mark_token_used(self, token: str, now: datetime.datetime) -> None:
+        """Flag a token as used at ``now``."""
+
+    @abstractmethod
+    async def redeem_token(
+        self, token: str, user_id: int, now: datetime.datetime
+    ) -> Optional[int]:
+        """Consume a valid token and grant its days to ``user_id`` atomically.
+
+        Returns the granted days, or None if the token doesn't exist, was
+        already used or has expired.
+        """
+
+    @abstractmethod
+    async def delete_stale_tokens(
+        self, used_before: datetime.datetime, expired_before: datetime.datetime, limit: int
+    ) -> int:
+        """Delete up to ``limit`` tokens used or expired before the given times.
+
+        Returns how many were deleted.
+        """
+
+    # Config
+
+    @abstractmethod
+    async def get_config(self, key: str) -> Optional[str]:
+        """Return the configuration value for ``key``."""
+
+    @abstractmethod
+    async def set_config(self, key: str, value: str) -> None:
+        """Store a configuration value."""
+
+
+def _row_to_subscription(row: aiosqlite.Row) -> Subscription:
+    return Subscription(
+        user_id=row["user_id"],
+        start_date=datetime.datetime.fromisoformat(row["start_date"]),
+        end_date=datetime.datetime.fromisoformat(row["end_date"]),
+        duration_days=row["duration_days"],
+    )
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def _row_to_user(row: aiosqlite.Row) -> User:
+    return User(
+        id=row["id"],
+        username=row["username"],
+        full_name=row["full_name"],
+        is_admin=bool(row["is_admin"]),
+        timezone=row["timezone"],
+    )
+
+
+# The functions below run on the connection thread through run_in_thread.
+# ``with conn`` commits when the block succeeds and rolls back otherwise.
+
+
+def _upsert_user_sync(
+    conn: sqlite3.Connection, user_id: int, username: Optional[str], full_name: str
+) -> None:
+    with conn:
+        if username is not None:
+            # Telegram usernames move between accounts; release a stale owner
+            conn.execute(
+                "UPDATE user SET username=NULL WHERE username=? AND id<>?",
+                (username, user_id),
+            )
+        conn.execute(
+            "INSERT INTO user (id, username, full_name) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET username=excluded.username, "
+            "full_name=excluded.full_name",
+            (user_id, username, full_name),
+        )
+
+
+def _set_admins_sync(conn: sqlite3.Connection, user_ids: list[int]) -> None:
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO user (id, username, full_name) VALUES (?, NULL, ?)",
+            [(user_id, str(user_id)) for user_id in user_ids],
+        )
+        conn.executemany(
+            "UPDATE user SET is_admin=1 WHERE id=?", [(user_id,) for user_id in user_ids]
+        )
+
+
+def _record_event(
+    conn: sqlite3.Connection,
+    user_id: int,
+    event: str,
+    duration_days: int,
+    token: Optional[str],
+    now: datetime.datetime,
+) -> None:
+    """Append a history event and bump its daily rollup without committing."""
+    conn.execute(
+        "INSERT INTO subscription_event (user_id, event, duration_days, token, created_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (user_id, event, duration_days, token, now.isoformat()),
+    )
+    conn.execute(
+        "INSERT INTO subscription_daily (day, event, duration_days, count) "
+        "VALUES (?, ?, ?, 1) "
+        "ON CONFLICT(day, event, duration_days) DO UPDATE SET count=count+1",
+        (now.date().isoformat(), event, duration_days),
+    )
+
+
+def _grant(conn: sqlite3.Connection, grants: Sequence[Grant], now: datetime.datetime) -> None:
+    """Add or extend subscriptions without committing."""
+    for user_id, duration_days, token in grants:
+        row = conn.execute(
+            "SELECT user_id, start_date, end_date, duration_days FROM subscription "
+            "WHERE user_id=?",
+            (user_id,),
+        ).fetchone()
+        current = _row_to_subscription(row) if row else None
+        sub, event = extend_subscription(current, user_id, duration_days, now)
+        if current is None:
+            conn.execute(
+                "INSERT INTO subscription (user_id, start_date, end_date, duration_days) "
+                "VALUES (?, ?, ?, ?)",
+                (user_id, sub.start_date.isoformat(), sub.end_date.isoformat(), duration_days),
+            )
+        else:
+            conn.execute(
+                "UPDATE subscription SET start_date=?, end_date=?, duration_days=? "
+                "WHERE user_id=?",
+                (sub.start_date.isoformat(), sub.end_date.isoformat(), duration_days, user_id),
+            )
+        _record_event(conn, user_id, event, duration_days, token, now)
+
+
+def _grant_sync(conn: sqlite3.Connection, grants: Sequence[Grant], now: datetime.datetime) -> None:
+    with conn:
+        _grant(conn, grants, now)
+
+
+def _remove_sync(
+    conn: sqlite3.Connection, user_ids: list[int], event: str, now: datetime.datetime
+) -> int:
+    removed = 0
+    with conn:
+        for user_id in user_ids:
+            cursor = conn.execute("DELETE FROM subscription WHERE user_id=?", (user_id,))
+            if cursor.rowcount:
+                _record_event(conn, user_id, event, 0, None, now)
+                removed += 1
+    return removed
+
+
+def _add_token_sync(
+    conn: sqlite3.Connection,
+    token: str,
+    duration_days: int,
+    created_at: datetime.datetime,
+    expires_at: Optional[datetime.datetime],
+) -> bool:
+    # A collision is an ignored row rather than an IntegrityError, so nothing is rolled back
+    with conn:
+        return conn.execute(
+            "INSERT OR IGNORE INTO token (token, duration_days, used, created_at, expires_at) "
+            "VALUES (?, ?, 0, ?, ?)",
+            (
+                token,
+                duration_days,
+                created_at.isoformat(),
+                expires_at.isoformat() if expires_at else None,
+            ),
+        ).rowcount == 1
+
+
+def _redeem_token_sync(
+    conn: sqlite3.Connection, token: str, user_id: int, now: datetime.datetime
+) -> Optional[int]:
+    with conn:
+        row = conn.execute(
+            "SELECT duration_days FROM token WHERE token=? AND used=0 "
+            "AND (expires_at IS NULL OR expires_at>?)",
+            (token, now.isoformat()),
+        ).fetchone()
+        if row is None:
+            return None
+        duration_days = int(row["duration_days"])
+        conn.execute(
+            "UPDATE token SET used=1, used_at=? WHERE token=?", (now.isoformat(), token)
+        )
+        _grant(conn, [(user_id, duration_days, token)], now)
+    return duration_days
+
+
+def _write_sync(conn: sqlite3.Connection, sql: str, params: Sequence[Any]) -> int:
+    """Run one write statement and commit; return the affected row count."""
+    with conn:
+        return conn.execute(sql, params).rowcount
+
+
+class SQLiteRepository(Repository):
+    """Repository backed by a tenant's aiosqlite connection.
+
+    Reads go through ``execute_fetchall`` and each write method runs with
+    its commit in one function on the connection thread, so every call
+    costs a single trip to aiosqlite's worker whatever its statement count.
+    """
+
+    def __init__(self, db: aiosqlite.Connection, full_text: bool = True) -> None:
+        self.db = db
+        self.full_text = full_text
+
+    async def _fetchone(self, sql: str, params: Sequence[Any] = ()) -> Optional[sqlite3.Row]:
+        rows = await self.db.execute_fetchall(sql, params)
+        return next(iter(rows), None)
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        row = await self._fetchone(
+            "SELECT id, username, full_name, is_admin, timezone FROM user WHERE id=?", (user_id,)
+        )
+        return _row_to_user(row) if row else None
+
+    async def get_user_context(self, user_id: int) -> Optional[UserContext]:
+        row = await self._fetchone(
+            "SELECT u.id, u.is_admin, u.timezone, MAX(s.end_date) AS subscription_end "
+            "FROM user u LEFT JOIN subscription s ON s.user_id=u.id WHERE u.id=? GROUP BY u.id",
+            (user_id,),
+        )
+        if row is None:
+            return None
+        return UserContext(
+            user_id=row["id"],
+            is_admin=bool(row["is_admin"]),
+            timezone=row["timezone"],
+            subscription_end=_parse_datetime(row["subscription_end"]),
+        )
+
+    async def iter_users(self) -> AsyncIterator[User]:
+        async with self.db.execute(
+            "SELECT id, username, full_name, is_admin, timezone FROM user"
+        ) as cur:
+            async for row in cur:
+                yield _row_to_user(row)
+
+    async def count_users(self) -> int:
+        row = await self._fetchone("SELECT COUNT(*) FROM user")
+        return int(row[0]) if row else 0
+
+    async def upsert_user(self, user_id: int, username: Optional[str], full_name: str) -> None:
+        await run_in_thread(self.db, _upsert_user_sync, user_id, username, full_name)
+
+    async def set_user_timezone(self, user_id: int, timezone: Optional[str]) -> None:
+        await run_in_thread(
+            self.db, _write_sync, "UPDATE user SET timezone=? WHERE id=?", (timezone, user_id)
+        )
+
+    async def set_admins(self, user_ids: Iterable[int]) -> None:
+        await run_in_thread(self.db, _set_admins_sync, list(user_ids))
+
+    async def search_users(self, query: str, limit: int, offset: int = 0) -> list[UserMatch]:
+        terms, user_id = search_terms(query)
+        if not terms:
+            return []
+        # Subscription status comes from the same query. Matches are ordered by ID,
+        # after an exact ID hit, so FTS5 can stop after the requested page instead
+        # of ranking every match of a short prefix.
+        if self.full_text:
+            sql = (
+                "SELECT u.id, u.username, u.full_name, u.is_admin, u.timezone, "
+                "(SELECT MAX(end_date) FROM subscription WHERE user_id=u.id) AS subscription_end "
+                "FROM (SELECT id, 0 AS exact FROM user WHERE id=? "
+                "UNION ALL SELECT id, 1 FROM (SELECT rowid AS id FROM user_fts "
+                "WHERE user_fts MATCH ? ORDER BY rowid LIMIT ?)) AS hit "
+                "JOIN user u ON u.id=hit.id "
+                "GROUP BY u.id ORDER BY MIN(hit.exact), u.id LIMIT ? OFFSET ?"
+            )
+            match = " ".join(f'"{term}"*' for term in terms)
+            params: tuple = (user_id, match, offset + limit, limit, offset)
+        else:
+            like = "%" + "%".join(terms) + "%"
+            sql = (
+                "SELECT u.id, u.username, u.full_name, u.is_admin, u.timezone, "
+                "(SELECT MAX(end_date) FROM subscription WHERE user_id=u.id) AS subscription_end "
+                "FROM user u WHERE u.id=? OR u.username LIKE ? OR u.full_name LIKE ? "
+                "ORDER BY u.id<>?, u.id LIMIT ? OFFSET ?"
+            )
+            params = (user_id, like, like, user_id, limit, offset)
+        return [
+            UserMatch(
+                user=_row_to_user(row),
+                subscription_end=_parse_datetime(row["subscription_end"]),
+            )
+            for row in await self.db.execute_fetchall(sql, params)
+        ]
+
+    async def find_user_ids(self, user_ids: Iterable[int]) -> set[int]:
+        found: set[int] = set()
+        id_list = list(user_ids)
+        for i in range(0, len(id_list), _LOOKUP_CHUNK):
+            chunk = id_list[i : i + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = await self.db.execute_fetchall(
+                f"SELECT id FROM user WHERE id IN ({placeholders})", chunk
+            )
+            found.update(int(row["id"]) for row in rows)
+        return found
+
+    async def find_usernames(self, usernames: Iterable[str]) -> dict[str, int]:
+        found: dict[str, int] = {}
+        name_list = list(usernames)
+        for i in range(0, len(name_list), _LOOKUP_CHUNK):
+            chunk = name_list[i : i + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = await self.db.execute_fetchall(
+                f"SELECT id, username FROM user WHERE username IN ({placeholders})", chunk
+            )
+            for row in rows:
+                found[row["username"]] = int(row["id"])
+        return found
+
+    async def get_subscription(self, user_id: int) -> Optional[Subscription]:
+        row = await self._fetchone(
+            "SELECT user_id, start_date, end_date, duration_days FROM subscription "
+            "WHERE user_id=?",
+            (user_id,),
+        )
+        return _row_to_subscription(row) if row else None
+
+    async def grant_subscriptions(self, grants: Sequence[Grant], now: datetime.datetime) -> None:
+        await run_in_thread(self.db, _grant_sync, list(grants), now)
+
+    async def remove_subscriptions(
+        self, user_ids: Iterable[int], event: str, now: datetime.datetime
+    ) -> int:
+        return await run_in_thread(self.db, _remove_sync, list(user_ids), event, now)
+
+    async def iter_active_subscriptions(
+        self, now: datetime.datetime, batch_size: int
+    ) -> AsyncIterator[Subscription]:
+        last_rowid = 0
+        while True:
+            rows = list(
+                await self.db.execute_fetchall(
+                    "SELECT rowid, user_id, start_date, end_date, duration_days FROM subscription "
+                    "WHERE end_date>? AND rowid>? ORDER BY rowid LIMIT ?",
+                    (now.isoformat(), last_rowid, batch_size),
+                )
+            )
+            if not rows:
+                return
+            last_rowid = rows[-1]["rowid"]
+            for row in rows:
+                yield _row_to_subscription(row)
+            if len(rows) < batch_size:
+                return
+
+    async def count_active_subscriptions(self, now: datetime.datetime) -> int:
+        row = await self._fetchone(
+            "SELECT COUNT(*) FROM subscription WHERE end_date>?", (now.isoformat(),)
+        )
+        return int(row[0]) if row else 0
+
+    async def count_expired_subscriptions(self, now: datetime.datetime) -> int:
+        row = await self._fetchone(
+            "SELECT COUNT(*) FROM subscription WHERE end_date<=?", (now.isoformat(),)
+        )
+        return int(row[0]) if row else 0
+
+    async def list_expiring_subscriptions(self, before: datetime.datetime) -> list[Subscription]:
+        rows = await self.db.execute_fetchall(
+            "SELECT user_id, start_date, end_date, duration_days FROM subscription "
+            "WHERE end_date<=? ORDER BY end_date",
+            (before.isoformat(),),
+        )
+        return [_row_to_subscription(row) for row in rows]
+
+    async def add_token(
+        self,
+        token: str,
+        duration_days: int,
+        created_at: datetime.datetime,
+        expires_at: Optional[datetime.datetime],
+    ) -> bool:
+        return await run_in_thread(
+            self.db, _add_token_sync, token, duration_days, created_at, expires_at
+        )
+
+    async def get_token(self, token: str) -> Optional[Token]:
+        row = await self._fetchone(
+            "SELECT token, duration_days, used, created_at, expires_at, used_at "
+            "FROM token WHERE token=?",
+            (token,),
+        )
+        if row is None:
+            return None
+        return Token(
+            token=row["token"],
+            duration_days=int(row["duration_days"]),
+            used=bool(row["used"]),
+            created_at=_parse_datetime(row["created_at"]),
+            expires_at=_parse_datetime(row["expires_at"]),
+            used_at=_parse_datetime(row["used_at"]),
+        )
+
+    async def mark_token_used(self, token: str, now: datetime.datetime) -> None:
+        await run_in_thread(
+            self.db,
+            _write_sync,
+            "UPDATE token SET used=1, used_at=? WHERE token=?",
+            (now.isoformat(), token),
+        )
+
+    async def redeem_token(
+        self, token: str, user_id: int, now: datetime.datetime
+    ) -> Optional[int]:
+        return await run_in_thread(self.db, _redeem_token_sync, token, user_id, now)
+
+    async def delete_stale_tokens(
+        self, used_before: datetime.datetime, expired_before: datetime.datetime, limit: int
+    ) -> int:
+        # Both branches are served by their partial index
+        return await run_in_thread(
+            self.db,
+            _write_sync,
+            "DELETE FROM token WHERE rowid IN ("
+            "SELECT rowid FROM token WHERE used=1 AND used_at<? "
+            "UNION SELECT rowid FROM token WHERE expires_at IS NOT NULL AND expires_at<? "
+            "LIMIT ?)",
+            (used_before.isoformat(), expired_before.isoformat(), limit),
+        )
+
+    async def get_config(self, key: str) -> Optional[str]:
+        row = await self._fetchone("SELECT value FROM config WHERE key=?", (key,))
+        return None if row is None else str(row["value"])
+
+    async def set_config(self, key: str, value: str) -> None:
+        await run_in_thread(
+            self.db,
+            _write_sync,
+            "INSERT INTO config (key, value) VALUES (?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value=excluded.value",
+            (key, value),
+        )
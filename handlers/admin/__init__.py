@@ -4,6 +4,8 @@ from .broadcast import router as broadcast_router
 from .config import router as config_router
 from .menu import ADMIN_MENU_KB, router as menu_router
 from .pricing import router as pricing_router
+from .export import router as export_router
+from .system import router as system_router
 
 __all__ = [
     "token_router",
@@ -12,5 +14,7 @@ __all__ = [
     "config_router",
     "pricing_router",
     "menu_router",
+    "export_router",
+    "system_router",
     "ADMIN_MENU_KB",
 ]
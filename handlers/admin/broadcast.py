@@ -1,43 +1,139 @@
 from __future__ import annotations
 
-from aiogram import Router
+import datetime
+import html
+import logging
+from typing import Awaitable
+
+from aiogram import F, Router
+from aiogram.dispatcher.event.bases import SkipHandler
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from bot import bot, messages
-from database import get_db
-from services.subscription_service import list_active_subscriptions
+from bot import messages
+from config import settings
+from database.models import UserContext
+from services.admin_service import is_admin
+from services.broadcast_service import (
+    BroadcastResult,
+    album_message_ids,
+    broadcast_copy,
+    broadcast_text,
+    remember_album_message,
+    start_in_background,
+)
+from services.scheduled_broadcast_service import schedule_broadcast
+
+logger = logging.getLogger(__name__)
 
 router = Router()
 
 
+@router.message(F.media_group_id)
+async def collect_album(message: Message, user_context: UserContext | None = None) -> None:
+    # Telegram delivers albums one message at a time; remember the admin's
+    # so replying to any item can broadcast the whole album. The injected
+    # context is cached, so other users' albums don't cost a query per item.
+    if user_context is not None and user_context.is_admin:
+        remember_album_message(message.chat.id, message.media_group_id, message.message_id)
+    raise SkipHandler()
+
+
+async def _deliver_and_report(message: Message, delivery: Awaitable[BroadcastResult]) -> None:
+    try:
+        result = await delivery
+    except Exception:
+        logger.exception("Broadcast for %s failed", settings.current.NAME)
+        await message.answer(messages.BROADCAST_FAILED)
+        return
+    await message.answer(
+        messages.BROADCAST_SENT.format(count=result.sent, failed=result.failed)
+    )
+
+
 @router.message(Command("broadcast"))
 async def cmd_broadcast(message: Message, command: Command.CommandObject) -> None:
-    db = get_db()
     tg_user = message.from_user
     if tg_user is None:
         return
 
     # Only admins can broadcast
-    async with db.execute("SELECT is_admin FROM user WHERE id=?", (tg_user.id,)) as cur:
-        row = await cur.fetchone()
-    if not (row and row["is_admin"] == 1):
+    if not await is_admin(tg_user.id):
         await message.answer(messages.ADMIN_ONLY)
         return
 
     text = command.args.strip() if command.args else None
-    if not text:
+    source = message.reply_to_message
+    if source is not None:
+        message_ids = [source.message_id]
+        if source.media_group_id:
+            message_ids = album_message_ids(source.chat.id, source.media_group_id) or message_ids
+        delivery = broadcast_copy(source.chat.id, message_ids)
+    elif text:
+        delivery = broadcast_text(text)
+    else:
         await message.answer(messages.BROADCAST_USAGE)
         return
 
-    subs = await list_active_subscriptions()
-    sent = 0
-    for sub in subs:
+    # Sending takes minutes for large audiences; don't hold the admin's queue meanwhile
+    await message.answer(messages.BROADCAST_STARTED)
+    start_in_background(_deliver_and_report(message, delivery))
+
+
+def _parse_schedule(args: str) -> tuple[datetime.time, datetime.date | None, str]:
+    """Split ``HH:MM [YYYY-MM-DD] [text]``; raise ``ValueError`` if malformed."""
+    parts = args.split(maxsplit=1)
+    local_time = datetime.datetime.strptime(parts[0], "%H:%M").time()
+    rest = parts[1] if len(parts) > 1 else ""
+    date = None
+    head = rest.split(maxsplit=1)
+    if head:
         try:
-            await bot.send_message(sub.user_id, text)
-            sent += 1
-        except Exception:
-            # Ignore delivery errors (user blocked bot, etc.)
+            date = datetime.date.fromisoformat(head[0])
+            rest = head[1] if len(head) > 1 else ""
+        except ValueError:
             pass
+    return local_time, date, rest.strip()
 
-    await message.answer(messages.BROADCAST_SENT.format(count=sent))
+
+@router.message(Command("schedule_broadcast"))
+async def cmd_schedule_broadcast(message: Message, command: Command.CommandObject) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+    if not await is_admin(tg_user.id):
+        await message.answer(messages.ADMIN_ONLY)
+        return
+
+    try:
+        local_time, date, text = _parse_schedule(command.args or "")
+    except (ValueError, IndexError):
+        await message.answer(messages.SCHEDULE_BROADCAST_USAGE)
+        return
+
+    source = message.reply_to_message
+    if source is not None:
+        message_ids = [source.message_id]
+        if source.media_group_id:
+            message_ids = album_message_ids(source.chat.id, source.media_group_id) or message_ids
+        result = await schedule_broadcast(
+            tg_user.id, local_time, date, from_chat_id=source.chat.id, message_ids=message_ids
+        )
+    elif text:
+        result = await schedule_broadcast(tg_user.id, local_time, date, text=text)
+    else:
+        await message.answer(messages.SCHEDULE_BROADCAST_USAGE)
+        return
+
+    if not result.recipients:
+        await message.answer(messages.SCHEDULE_BROADCAST_EMPTY)
+        return
+    await message.answer(
+        messages.SCHEDULE_BROADCAST_DONE.format(
+            id=result.broadcast_id,
+            count=result.recipients,
+            time=html.escape(local_time.strftime("%H:%M")),
+            first=result.first_due.strftime("%Y-%m-%d %H:%M"),
+            last=result.last_due.strftime("%Y-%m-%d %H:%M"),
+        )
+    )
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import shutil
+import tempfile
+from pathlib import Path
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import FSInputFile, Message
+
+from services.admin_service import is_admin
+from services.export_service import EXPORT_TABLES, export_tables
+from bot import messages
+
+router = Router()
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: Command.CommandObject) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+    if not await is_admin(tg_user.id):
+        await message.answer(messages.ADMIN_ONLY)
+        return
+
+    args = command.args.split() if command.args else []
+    compress = "gz" in args
+    names = [a for a in args if a != "gz"] or list(EXPORT_TABLES)
+    if any(name not in EXPORT_TABLES for name in names):
+        await message.answer(messages.EXPORT_USAGE)
+        return
+
+    directory = Path(tempfile.mkdtemp(prefix="export_"))
+    try:
+        paths = await export_tables(names, directory, compress=compress)
+        for path in paths:
+            await message.answer_document(FSInputFile(path))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
@@ -6,18 +6,31 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQu
 import datetime
 from zoneinfo import ZoneInfo
 
-from services.config_service import get_pricing, get_config, set_price
-from services.subscription_service import list_active_subscriptions, remove_subscription
+from services.config_service import get_config
+from services.pricing_service import estimate_revenue, get_currency, list_prices, set_price
+from services.subscription_service import (
+    count_active_subscriptions,
+    count_expired_subscriptions,
+    iter_active_subscriptions,
+    remove_subscription,
+)
+from services.stats_service import (
+    count_churn,
+    count_renewals,
+    count_user_renewals,
+    most_popular_duration,
+)
 from services.token_service import generate_token
+from services.user_service import count_users
 from bot import messages
 from config import settings
-from database import get_db
+from utils.tenancy import current_tenant
 
 router = Router()
 __all__ = ["ADMIN_MENU_KB", "router"]
 
-# Temporary storage for admins currently setting a price
-_waiting_price: dict[int, str] = {}
+# Temporary storage for admins currently setting a price, per (tenant, user ID)
+_waiting_price: dict[tuple[str, int], str] = {}
 
 ADMIN_MENU_KB = InlineKeyboardMarkup(
     inline_keyboard=[
@@ -57,10 +70,11 @@ ADMINISTRATION_MENU_KB = InlineKeyboardMarkup(
 
 @router.callback_query(lambda c: c.data == "admin_settings")
 async def cb_settings(callback: CallbackQuery) -> None:
-    pricing = await get_pricing()
     text = messages.SETTINGS_MENU
-    if pricing:
-        text += "\n" + messages.CURRENT_PRICE.format(period=pricing[0], amount=pricing[1])
+    for price in await list_prices(await get_currency()):
+        text += "\n" + messages.CURRENT_PRICE.format(
+            period=price.period, amount=f"{price.amount:g} {price.currency}"
+        )
     await callback.message.edit_text(text, reply_markup=SETTINGS_MENU_KB)
     await callback.answer()
 
@@ -78,7 +92,7 @@ async def cb_price_period(callback: CallbackQuery) -> None:
     if tg_id is None:
         await callback.answer()
         return
-    _waiting_price[tg_id] = period
+    _waiting_price[(current_tenant.get(), tg_id)] = period
     await callback.message.edit_text(messages.PRICE_ENTER_AMOUNT)
     await callback.answer()
 
@@ -97,32 +111,15 @@ async def cb_back(callback: CallbackQuery) -> None:
 
 @router.callback_query(lambda c: c.data == "admin_stats")
 async def cb_stats(callback: CallbackQuery) -> None:
-    db = get_db()
-    now_iso = datetime.datetime.utcnow().isoformat()
-
-    async with db.execute("SELECT COUNT(*) FROM user") as cur:
-        row = await cur.fetchone()
-    total_users = int(row[0]) if row else 0
-
-    subs = await list_active_subscriptions()
-    active = len(subs)
-
-    async with db.execute(
-        "SELECT COUNT(*) FROM subscription WHERE end_date<=?", (now_iso,)
-    ) as cur:
-        row = await cur.fetchone()
-    expired = int(row[0]) if row else 0
-
-    async with db.execute("SELECT COUNT(*) FROM token WHERE used=1") as cur:
-        row = await cur.fetchone()
-    renewals = int(row[0]) if row else 0
-
-    async with db.execute(
-        "SELECT duration_days, COUNT(*) c FROM token WHERE used=1 GROUP BY duration_days ORDER BY c DESC LIMIT 1"
-    ) as cur:
-        row = await cur.fetchone()
-    if row:
-        days = int(row[0])
+    total_users = await count_users()
+    active = await count_active_subscriptions()
+    expired = await count_expired_subscriptions()
+
+    renewals = await count_renewals()
+    churn = await count_churn(datetime.date.today() - datetime.timedelta(days=30))
+
+    days = await most_popular_duration()
+    if days is not None:
         if days >= 365 * 5:
             period = "permanent"
         elif days % 30 == 0:
@@ -133,11 +130,9 @@ async def cb_stats(callback: CallbackQuery) -> None:
     else:
         period = "N/A"
 
-    pricing = await get_pricing()
-    amount = float(pricing[1]) if pricing else 0
-    revenue = active * amount
+    currency = await get_currency()
+    revenue, _ = await estimate_revenue(currency)
 
-    currency = await get_config("currency") or "USD"
     tz_name = await get_config("timezone") or "UTC"
     try:
         local_time = datetime.datetime.now(ZoneInfo(tz_name)).strftime("%I:%M %p")
@@ -150,6 +145,7 @@ async def cb_stats(callback: CallbackQuery) -> None:
         active=active,
         expired=expired,
         renewals=renewals,
+        churn=churn,
         period=period,
         revenue=f"{revenue:,.0f}",
         currency=currency,
@@ -169,23 +165,23 @@ async def cb_broadcast(callback: CallbackQuery) -> None:
 
 @router.callback_query(lambda c: c.data == "admin_gen_link")
 async def cb_gen_link(callback: CallbackQuery) -> None:
-    token = await generate_token(7)
-    link = f"https://t.me/{settings.BOT_TOKEN.split(':')[0]}?start={token}"
+    hours = settings.TOKEN_TTL_HOURS
+    token = await generate_token(7, datetime.timedelta(hours=hours) if hours else None)
+    link = f"https://t.me/{settings.current.BOT_TOKEN.split(':')[0]}?start={token}"
     await callback.message.answer(messages.ACCESS_LINK.format(link=link))
     await callback.answer()
 
 
 @router.callback_query(lambda c: c.data == "admin_list_subs")
 async def cb_list_subs(callback: CallbackQuery) -> None:
-    subs = await list_active_subscriptions()
-    for sub in subs:
+    async for sub in iter_active_subscriptions():
         days = (sub.end_date - sub.start_date).days
         text = messages.SUBSCRIBER_INFO.format(
             user_id=sub.user_id,
             start=sub.start_date.date(),
             end=sub.end_date.date(),
             days=days,
-            renewals=0,
+            renewals=await count_user_renewals(sub.user_id),
         )
         kb = InlineKeyboardMarkup(
             inline_keyboard=[[InlineKeyboardButton(text="Eliminar", callback_data=f"remove_user:{sub.user_id}")]]
@@ -202,17 +198,19 @@ async def cb_remove(callback: CallbackQuery) -> None:
     await callback.answer()
 
 
-@router.message(lambda m: m.from_user and m.from_user.id in _waiting_price)
+@router.message(
+    lambda m: m.from_user and (current_tenant.get(), m.from_user.id) in _waiting_price
+)
 async def price_input(message: Message) -> None:
-    tg_id = message.from_user.id
-    period = _waiting_price.get(tg_id)
+    key = (current_tenant.get(), message.from_user.id)
+    period = _waiting_price.get(key)
     if period is None:
         return
     amount = message.text.strip()
     if not amount.isdigit():
         await message.answer(messages.PRICE_ENTER_AMOUNT)
         return
-    del _waiting_price[tg_id]
-    await set_price(period, amount)
+    del _waiting_price[key]
+    await set_price(period, float(amount))
     await message.answer(messages.PRICE_UPDATED.format(period=period, amount=amount))
 
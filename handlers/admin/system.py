@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import html
+import logging
+from pathlib import Path
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from config import settings
+from services.admin_service import is_admin
+from services.backup_service import backup_database
+from bot import messages, update_queue
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+
+@router.message(Command("queue_stats"))
+async def cmd_queue_stats(message: Message) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+    if not await is_admin(tg_user.id):
+        await message.answer(messages.ADMIN_ONLY)
+        return
+    await message.answer(messages.QUEUE_STATS.format(**update_queue.stats()))
+
+
+@router.message(Command("backup"))
+async def cmd_backup(message: Message) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+    if not await is_admin(tg_user.id):
+        await message.answer(messages.ADMIN_ONLY)
+        return
+    await message.answer(messages.BACKUP_STARTED)
+    try:
+        result = await backup_database(
+            Path(settings.BACKUP_DIR),
+            compress=settings.BACKUP_COMPRESS,
+            keep=settings.BACKUP_KEEP,
+        )
+    except Exception as exc:
+        logger.exception("Backup of %s failed", settings.current.NAME)
+        await message.answer(messages.BACKUP_FAILED.format(error=html.escape(str(exc))))
+        return
+    if not result.ok:
+        await message.answer(
+            messages.BACKUP_CORRUPT.format(integrity=html.escape(result.integrity))
+        )
+        return
+    await message.answer(
+        messages.BACKUP_DONE.format(
+            name=result.path.name,
+            size=result.size // 1024,
+            pages=result.pages,
+            elapsed=result.elapsed,
+        )
+    )
@@ -1,66 +1,74 @@
 from __future__ import annotations
 
+import datetime
+
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import Message
 
-from database import get_db
-from services.subscription_service import add_subscription
-from services.token_service import generate_token, validate_token, mark_token_as_used
+from config import settings
+from database.models import UserContext
+from services.token_service import generate_token, redeem_token
+from services.invite_service import get_invite_link
+from services.user_service import ensure_user
 from bot import messages
 
 router = Router()
 
 
 @router.message(Command("gen_token"))
-async def cmd_gen_token(message: Message, command: Command.CommandObject) -> None:
-    db = get_db()
-    tg_user = message.from_user
-    if tg_user is None:
+async def cmd_gen_token(
+    message: Message,
+    command: Command.CommandObject,
+    user_context: UserContext | None = None,
+) -> None:
+    if user_context is None:
         return
 
     # Check admin status
-    async with db.execute("SELECT is_admin FROM user WHERE id=?", (tg_user.id,)) as cur:
-        row = await cur.fetchone()
-    if not (row and row["is_admin"] == 1):
+    if not user_context.is_admin:
         await message.answer(messages.ADMIN_ONLY)
         return
 
+    parts = command.args.split() if command.args else []
     try:
-        days = int(command.args.strip()) if command.args else 0
+        days = int(parts[0]) if parts else 0
+        hours = int(parts[1]) if len(parts) > 1 else settings.TOKEN_TTL_HOURS
     except ValueError:
         days = 0
-    if days <= 0:
+    if days <= 0 or len(parts) > 2 or hours < 0:
         await message.answer(messages.GEN_TOKEN_USAGE)
         return
 
-    token = await generate_token(days)
-    await message.answer(messages.TOKEN_GENERATED.format(token=token))
+    token = await generate_token(days, datetime.timedelta(hours=hours) if hours else None)
+    text = messages.TOKEN_GENERATED.format(token=token)
+    if hours:
+        text += "\n" + messages.TOKEN_EXPIRES.format(hours=hours)
+    await message.answer(text)
 
 
 @router.message(Command("join"))
 async def cmd_join(message: Message, command: Command.CommandObject) -> None:
-    db = get_db()
     tg_user = message.from_user
     if tg_user is None:
         return
 
-    await db.execute(
-        "INSERT OR IGNORE INTO user (id, username, full_name) VALUES (?, ?, ?)",
-        (tg_user.id, tg_user.username or "", tg_user.full_name or ""),
-    )
-    await db.commit()
+    await ensure_user(tg_user)
 
     token = command.args.strip() if command.args else None
     if not token:
         await message.answer(messages.TOKEN_USAGE)
         return
 
-    duration = await validate_token(token)
+    duration = await redeem_token(token, tg_user.id)
     if duration is None:
         await message.answer(messages.INVALID_TOKEN)
         return
 
-    await mark_token_as_used(token)
-    await add_subscription(tg_user.id, duration)
-    await message.answer(messages.SUB_ACTIVATED.format(duration=duration))
+    invite = await get_invite_link(tg_user.id)
+    if invite is None:
+        await message.answer(messages.SUB_ACTIVATED.format(duration=duration))
+    else:
+        await message.answer(
+            messages.SUB_ACTIVATED_WITH_LINK.format(duration=duration, invite=invite)
+        )
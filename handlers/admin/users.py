@@ -2,30 +2,40 @@ from __future__ import annotations
 
 from aiogram import Router
 from aiogram.filters import Command
-from aiogram.types import Message
-
-from database import get_db
+from aiogram.types import (
+    BufferedInputFile,
+    CallbackQuery,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    Message,
+)
+
+import csv
+import datetime
+import html
+import io
+
+from services.admin_service import is_admin
+from services.bulk_service import MAX_FILE_SIZE, apply_bulk_file
 from services.subscription_service import add_subscription, remove_subscription
-from bot import messages
+from services.user_service import find_user_id, search_users
+from bot import get_bot, messages
+from utils.tenancy import current_tenant
 
 router = Router()
 
+FIND_PAGE_SIZE = 10
 
-async def _ensure_admin(tg_id: int) -> bool:
-    """Return True if the given Telegram ID belongs to an admin user."""
-    db = get_db()
-    async with db.execute("SELECT is_admin FROM user WHERE id=?", (tg_id,)) as cur:
-        row = await cur.fetchone()
-    return bool(row and row["is_admin"] == 1)
+# Last /find query of each admin, per (tenant, user ID), for the page buttons
+_searches: dict[tuple[str, int], str] = {}
 
 
 @router.message(Command("add_sub"))
 async def cmd_add_sub(message: Message, command: Command.CommandObject) -> None:
-    db = get_db()
     tg_user = message.from_user
     if tg_user is None:
         return
-    if not await _ensure_admin(tg_user.id):
+    if not await is_admin(tg_user.id):
         await message.answer(messages.ADMIN_ONLY)
         return
 
@@ -45,23 +55,21 @@ async def cmd_add_sub(message: Message, command: Command.CommandObject) -> None:
         await message.answer(messages.ADD_SUB_USAGE)
         return
 
-    async with db.execute("SELECT id FROM user WHERE username=?", (username,)) as cur:
-        row = await cur.fetchone()
-    if not row:
+    user_id = await find_user_id(username)
+    if user_id is None:
         await message.answer(messages.USER_NOT_FOUND)
         return
 
-    await add_subscription(int(row["id"]), days)
+    await add_subscription(user_id, days)
     await message.answer(messages.SUB_ADDED.format(days=days, username=username))
 
 
 @router.message(Command("remove_sub"))
 async def cmd_remove_sub(message: Message, command: Command.CommandObject) -> None:
-    db = get_db()
     tg_user = message.from_user
     if tg_user is None:
         return
-    if not await _ensure_admin(tg_user.id):
+    if not await is_admin(tg_user.id):
         await message.answer(messages.ADMIN_ONLY)
         return
 
@@ -70,11 +78,120 @@ async def cmd_remove_sub(message: Message, command: Command.CommandObject) -> No
         return
 
     username = command.args.strip().lstrip("@").strip()
-    async with db.execute("SELECT id FROM user WHERE username=?", (username,)) as cur:
-        row = await cur.fetchone()
-    if not row:
+    user_id = await find_user_id(username)
+    if user_id is None:
         await message.answer(messages.USER_NOT_FOUND)
         return
 
-    await remove_subscription(int(row["id"]))
+    await remove_subscription(user_id)
     await message.answer(messages.SUB_REMOVED.format(username=username))
+
+
+@router.message(Command("bulk_sub"))
+async def cmd_bulk_sub(message: Message) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+    if not await is_admin(tg_user.id):
+        await message.answer(messages.ADMIN_ONLY)
+        return
+
+    document = message.document
+    if document is None and message.reply_to_message is not None:
+        document = message.reply_to_message.document
+    if document is None:
+        await message.answer(messages.BULK_SUB_USAGE)
+        return
+
+    if document.file_size is not None and document.file_size > MAX_FILE_SIZE:
+        await message.answer(messages.BULK_SUB_TOO_LARGE.format(limit=MAX_FILE_SIZE // 2**20))
+        return
+
+    data = await get_bot().download(document)
+    try:
+        result = await apply_bulk_file(data.read())
+    except UnicodeDecodeError:
+        await message.answer(messages.BULK_SUB_ENCODING)
+        return
+
+    await message.answer(
+        messages.BULK_SUB_DONE.format(
+            granted=result.granted,
+            revoked=result.revoked,
+            rejected=len(result.rejected),
+            **{k: v * 1000 for k, v in result.timings.items()},
+        )
+    )
+    if result.rejected:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        writer.writerow(["line", "user", "reason"])
+        writer.writerows(result.rejected)
+        await message.answer_document(
+            BufferedInputFile(out.getvalue().encode("utf-8"), filename="unmatched.csv")
+        )
+
+
+async def _render_search(query: str, page: int) -> tuple[str, InlineKeyboardMarkup | None]:
+    matches, has_more = await search_users(query, page, FIND_PAGE_SIZE)
+    if not matches:
+        return messages.FIND_EMPTY.format(query=html.escape(query)), None
+
+    now = datetime.datetime.utcnow()
+    lines = [messages.FIND_HEADER.format(query=html.escape(query), page=page + 1)]
+    for match in matches:
+        end = match.subscription_end
+        if end is None:
+            status = messages.FIND_STATUS_NONE
+        elif end > now:
+            status = messages.FIND_STATUS_ACTIVE.format(end=end.date())
+        else:
+            status = messages.FIND_STATUS_EXPIRED.format(end=end.date())
+        user = match.user
+        lines.append(
+            messages.FIND_ROW.format(
+                id=user.id,
+                name=html.escape(user.full_name),
+                username=f" @{html.escape(user.username)}" if user.username else "",
+                status=status,
+            )
+        )
+
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(text="« Anterior", callback_data=f"find_page:{page - 1}"))
+    if has_more:
+        buttons.append(InlineKeyboardButton(text="Siguiente »", callback_data=f"find_page:{page + 1}"))
+    kb = InlineKeyboardMarkup(inline_keyboard=[buttons]) if buttons else None
+    return "\n".join(lines), kb
+
+
+@router.message(Command("find"))
+async def cmd_find(message: Message, command: Command.CommandObject) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+    if not await is_admin(tg_user.id):
+        await message.answer(messages.ADMIN_ONLY)
+        return
+
+    query = command.args.strip() if command.args else ""
+    if not query:
+        await message.answer(messages.FIND_USAGE)
+        return
+
+    _searches[(current_tenant.get(), tg_user.id)] = query
+    text, kb = await _render_search(query, 0)
+    await message.answer(text, reply_markup=kb)
+
+
+@router.callback_query(lambda c: c.data and c.data.startswith("find_page:"))
+async def cb_find_page(callback: CallbackQuery) -> None:
+    query = _searches.get((current_tenant.get(), callback.from_user.id))
+    if query is None or not await is_admin(callback.from_user.id):
+        await callback.answer()
+        return
+    page = int(callback.data.split(":", 1)[1])
+    text, kb = await _render_search(query, page)
+    await callback.message.edit_text(text, reply_markup=kb)
+    await callback.answer()
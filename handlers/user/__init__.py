@@ -1,4 +1,5 @@
 from .start import router as start_router
+from .timezone import router as timezone_router
 from .menu import USER_MENU_KB, SUBSCRIPTION_MENU_KB
 
-__all__ = ["start_router", "USER_MENU_KB", "SUBSCRIPTION_MENU_KB"]
+__all__ = ["start_router", "timezone_router", "USER_MENU_KB", "SUBSCRIPTION_MENU_KB"]
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import html
+
+from aiogram import Router
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from services.user_service import ensure_user, get_timezone, set_timezone
+from bot import messages
+
+router = Router()
+
+
+@router.message(Command("timezone"))
+async def cmd_timezone(message: Message, command: Command.CommandObject) -> None:
+    tg_user = message.from_user
+    if tg_user is None:
+        return
+
+    await ensure_user(tg_user)
+
+    name = command.args.strip() if command.args else None
+    if not name:
+        current = await get_timezone(tg_user.id)
+        await message.answer(
+            messages.TIMEZONE_CURRENT.format(timezone=current or messages.TIMEZONE_DEFAULT)
+        )
+        return
+
+    if name.lower() == "reset":
+        await set_timezone(tg_user.id, None)
+        await message.answer(messages.TIMEZONE_SET.format(timezone=messages.TIMEZONE_DEFAULT))
+        return
+    try:
+        await set_timezone(tg_user.id, name)
+    except ValueError:
+        await message.answer(messages.TIMEZONE_INVALID.format(timezone=html.escape(name)))
+        return
+    await message.answer(messages.TIMEZONE_SET.format(timezone=name))
@@ -1,11 +1,19 @@
 import asyncio
+import logging
 
-from bot import bot, dp
+from bot import bots, dp
 from database import init_db
-from config import settings
+from config import TenantSettings, settings
 from services.admin_service import ensure_admins
+from services.pricing_service import migrate_legacy_prices
+from services.user_service import load_known_users
 from tools.subscription_monitor import monitor_subscriptions
-from handlers.user import start_router
+from tools.invite_pool import maintain_invite_pool
+from tools.kick_worker import run_kick_worker
+from tools.backup_scheduler import schedule_backups
+from tools.token_compactor import compact_token_table
+from tools.broadcast_scheduler import run_broadcast_scheduler
+from handlers.user import start_router, timezone_router
 from handlers.admin import (
     token_router,
     users_router,
@@ -13,22 +21,48 @@ from handlers.admin import (
     config_router,
     pricing_router,
     menu_router,
+    export_router,
+    system_router,
 )
+from utils.tenancy import tenant_scope
 
 
-async def main() -> None:
-    await init_db()
-    await ensure_admins(settings.ADMIN_IDS)
-    asyncio.create_task(monitor_subscriptions())
+async def init_tenant(tenant: TenantSettings) -> None:
+    """Open the tenant's database and load its caches."""
+    with tenant_scope(tenant.NAME):
+        await init_db(tenant.DB_PATH)
+        await ensure_admins(tenant.ADMIN_IDS)
+        await migrate_legacy_prices()
+        await load_known_users()
+
+
+def setup_dispatcher() -> None:
+    """Include every router in ``dp``, in priority order."""
     dp.include_router(start_router)
+    dp.include_router(timezone_router)
     dp.include_router(token_router)
     dp.include_router(users_router)
     dp.include_router(broadcast_router)
     dp.include_router(config_router)
     dp.include_router(pricing_router)
+    dp.include_router(export_router)
+    dp.include_router(system_router)
     dp.include_router(menu_router)
-    await dp.start_polling(bot)
+
+
+async def main() -> None:
+    await asyncio.gather(*(init_tenant(tenant) for tenant in settings.TENANTS))
+    asyncio.create_task(monitor_subscriptions())
+    asyncio.create_task(maintain_invite_pool())
+    asyncio.create_task(run_kick_worker())
+    asyncio.create_task(schedule_backups())
+    asyncio.create_task(compact_token_table())
+    asyncio.create_task(run_broadcast_scheduler())
+    setup_dispatcher()
+    # The update queue schedules handlers itself and needs polling to wait on it
+    await dp.start_polling(*bots.values(), handle_as_tasks=False)
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     asyncio.run(main())
@@ -1,20 +1,20 @@
 from __future__ import annotations
 
-from database import get_db
+from database import get_repository
+from services.user_service import invalidate_user_context
 
-__all__ = ["ensure_admins"]
+__all__ = ["ensure_admins", "is_admin"]
 
 
 async def ensure_admins(admin_ids: list[int]) -> None:
     """Insert or update admin users in the database."""
     if not admin_ids:
         return
-    db = get_db()
-    for admin_id in admin_ids:
-        await db.execute(
-            "INSERT OR IGNORE INTO user (id, username, full_name) VALUES (?, ?, ?)",
-            (admin_id, str(admin_id), str(admin_id)),
-        )
-        await db.execute("UPDATE user SET is_admin=1 WHERE id=?", (admin_id,))
-    await db.commit()
+    await get_repository().set_admins(admin_ids)
+    invalidate_user_context(admin_ids)
 
+
+async def is_admin(user_id: int) -> bool:
+    """Return True if the given Telegram ID belongs to an admin user."""
+    user = await get_repository().get_user(user_id)
+    return bool(user and user.is_admin)
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, Awaitable, Callable, Coroutine, Iterable, Optional, Union
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from bot import get_bot
+from services.subscription_service import iter_active_subscriptions
+from utils.rate_limiter import telegram_limiter
+from utils.tenancy import current_tenant
+
+__all__ = [
+    "BroadcastResult",
+    "Sender",
+    "deliver",
+    "message_sender",
+    "broadcast",
+    "broadcast_text",
+    "broadcast_copy",
+    "remember_album_message",
+    "album_message_ids",
+    "running_broadcasts",
+    "start_in_background",
+]
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 10
+# Albums remembered per process; only the most recent ones can be broadcast
+ALBUM_CACHE_SIZE = 100
+
+# Sends one message to a user
+Sender = Callable[[int], Awaitable[object]]
+
+# Broadcasts started with start_in_background that haven't finished yet
+running_broadcasts: set[asyncio.Task] = set()
+
+# (tenant, chat_id, media_group_id) -> message IDs of the album, in order
+_albums: "OrderedDict[tuple[str, int, str], list[int]]" = OrderedDict()
+
+
+@dataclass
+class BroadcastResult:
+    sent: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+
+def remember_album_message(chat_id: int, media_group_id: str, message_id: int) -> None:
+    """Record one message of an album so the whole album can be broadcast."""
+    key = (current_tenant.get(), chat_id, media_group_id)
+    ids = _albums.setdefault(key, [])
+    if message_id not in ids:
+        ids.append(message_id)
+        ids.sort()
+    _albums.move_to_end(key)
+    while len(_albums) > ALBUM_CACHE_SIZE:
+        _albums.popitem(last=False)
+
+
+def album_message_ids(chat_id: int, media_group_id: str) -> list[int]:
+    """Return the recorded message IDs of an album, oldest first."""
+    return list(_albums.get((current_tenant.get(), chat_id, media_group_id), []))
+
+
+async def deliver(
+    user_ids: Union[Iterable[int], AsyncIterable[int]], send: Sender, cost: int = 1
+) -> BroadcastResult:
+    """Call ``send(user_id)`` for every user through the tenant's limiter.
+
+    ``cost`` is how many messages one call delivers (an album counts once
+    per item). Flood-control replies hold back every sender and retry the
+    same user; other API errors (blocked bot, deleted account) and
+    unexpected exceptions count as failed.
+    """
+    result = BroadcastResult()
+    started = time.perf_counter()
+    queue: asyncio.Queue[int] = asyncio.Queue(maxsize=CONCURRENCY * 2)
+
+    async def worker() -> None:
+        while True:
+            user_id = await queue.get()
+            try:
+                while True:
+                    for _ in range(cost):
+                        await telegram_limiter.acquire()
+                    try:
+                        await send(user_id)
+                    except TelegramRetryAfter as exc:
+                        telegram_limiter.penalize(exc.retry_after)
+                        continue
+                    except TelegramAPIError:
+                        result.failed += 1
+                    except Exception:
+                        # A dead worker would leave its queue items unfinished forever
+                        logger.exception("Broadcast to %s failed", user_id)
+                        result.failed += 1
+                    else:
+                        result.sent += 1
+                    break
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(CONCURRENCY)]
+    try:
+        if isinstance(user_ids, AsyncIterable):
+            async for user_id in user_ids:
+                await queue.put(user_id)
+        else:
+            for user_id in user_ids:
+                await queue.put(user_id)
+        await queue.join()
+    finally:
+        for task in workers:
+            task.cancel()
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def start_in_background(job: Coroutine[Any, Any, Any]) -> asyncio.Task:
+    """Run a broadcast job as its own task, outside the sender's update queue.
+
+    The task inherits the current tenant. It is kept in
+    :data:`running_broadcasts` until it finishes.
+    """
+    task = asyncio.create_task(job)
+    running_broadcasts.add(task)
+    task.add_done_callback(running_broadcasts.discard)
+    return task
+
+
+async def _active_user_ids() -> AsyncIterable[int]:
+    async for sub in iter_active_subscriptions():
+        yield sub.user_id
+
+
+async def broadcast(send: Sender, cost: int = 1) -> BroadcastResult:
+    """Call ``send(user_id)`` for every active subscriber; see :func:`deliver`."""
+    return await deliver(_active_user_ids(), send, cost)
+
+
+def message_sender(
+    text: Optional[str] = None,
+    from_chat_id: Optional[int] = None,
+    message_ids: Optional[list[int]] = None,
+) -> tuple[Sender, int]:
+    """Return a sender for a text or copied message and its limiter cost.
+
+    Copies point at the file already stored on Telegram's servers, so the
+    media is uploaded once, by the admin, and each recipient costs a single
+    lightweight API call.
+    """
+    bot = get_bot()
+    if message_ids:
+        if len(message_ids) == 1:
+            return lambda user_id: bot.copy_message(user_id, from_chat_id, message_ids[0]), 1
+        return (
+            lambda user_id: bot.copy_messages(user_id, from_chat_id, message_ids),
+            len(message_ids),
+        )
+    return lambda user_id: bot.send_message(user_id, text), 1
+
+
+async def broadcast_text(text: str) -> BroadcastResult:
+    """Send ``text`` to every active subscriber."""
+    return await broadcast(*message_sender(text=text))
+
+
+async def broadcast_copy(from_chat_id: int, message_ids: list[int]) -> BroadcastResult:
+    """Copy messages (media, albums) to every active subscriber."""
+    return await broadcast(*message_sender(from_chat_id=from_chat_id, message_ids=message_ids))
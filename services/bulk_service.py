@@ -0,0 +1,102 @@
+import csv
+import io
+import time
+from dataclasses import dataclass, field
+
+from services.subscription_service import add_subscriptions, remove_subscriptions
+from services.user_service import resolve_users
+
+__all__ = ["MAX_FILE_SIZE", "BulkEntry", "BulkResult", "parse_bulk_file", "apply_bulk_file"]
+
+# Largest file /bulk_sub downloads, far above any real member list
+MAX_FILE_SIZE = 5 * 1024 * 1024
+
+# Values in the days column that revoke instead of grant
+_REVOKE_VALUES = {"0", "-", "remove", "revoke", "eliminar"}
+
+
+@dataclass
+class BulkEntry:
+    line: int
+    identifier: str
+    days: int  # 0 revokes the subscription
+
+
+@dataclass
+class BulkResult:
+    granted: int = 0
+    revoked: int = 0
+    # (line, identifier, reason)
+    rejected: list[tuple[int, str, str]] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+def parse_bulk_file(data: bytes) -> tuple[list[BulkEntry], list[tuple[int, str, str]]]:
+    """Parse ``user,days`` CSV rows into entries and rejected rows.
+
+    ``user`` is an ``@username`` or a numeric ID. ``days`` is a positive
+    number of days to grant or one of ``0``, ``-``, ``remove`` to revoke.
+    A first row whose days aren't a number and whose user is neither an
+    ``@username`` nor an ID is treated as a header; any other bad row is
+    rejected. Raises ``UnicodeDecodeError`` if ``data`` isn't UTF-8.
+    """
+    entries: list[BulkEntry] = []
+    rejected: list[tuple[int, str, str]] = []
+    reader = csv.reader(io.StringIO(data.decode("utf-8-sig")))
+    for line, row in enumerate(reader, start=1):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        ident = row[0].strip()
+        value = row[1].strip().lower() if len(row) > 1 else ""
+        if value in _REVOKE_VALUES:
+            entries.append(BulkEntry(line, ident, 0))
+            continue
+        try:
+            days = int(value)
+        except ValueError:
+            if line != 1 or ident.startswith("@") or ident.isdigit():
+                rejected.append((line, ident, "invalid days"))
+            continue
+        if days < 0 or not ident:
+            rejected.append((line, ident, "invalid row"))
+            continue
+        entries.append(BulkEntry(line, ident, days))
+    return entries, rejected
+
+
+async def apply_bulk_file(data: bytes, chunk_size: int = 500) -> BulkResult:
+    """Resolve and apply a bulk grant/revoke file in chunked transactions."""
+    result = BulkResult()
+    started = time.perf_counter()
+
+    entries, result.rejected = parse_bulk_file(data)
+    parsed = time.perf_counter()
+    result.timings["parse"] = parsed - started
+
+    resolved = await resolve_users(e.identifier for e in entries)
+    looked_up = time.perf_counter()
+    result.timings["lookup"] = looked_up - parsed
+
+    matched: list[tuple[BulkEntry, int]] = []
+    for entry in entries:
+        user_id = resolved.get(entry.identifier)
+        if user_id is None:
+            result.rejected.append((entry.line, entry.identifier, "user not found"))
+        else:
+            matched.append((entry, user_id))
+
+    for i in range(0, len(matched), chunk_size):
+        chunk = matched[i : i + chunk_size]
+        grants = [(user_id, e.days) for e, user_id in chunk if e.days > 0]
+        revokes = [user_id for e, user_id in chunk if e.days == 0]
+        if grants:
+            await add_subscriptions(grants)
+            result.granted += len(grants)
+        if revokes:
+            result.revoked += await remove_subscriptions(revokes)
+    finished = time.perf_counter()
+    result.timings["apply"] = finished - looked_up
+    result.timings["total"] = finished - started
+
+    result.rejected.sort()
+    return result
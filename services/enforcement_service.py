@@ -0,0 +1,75 @@
+import asyncio
+import datetime
+
+from database import get_db, run_write
+from database.models import PendingKick
+
+__all__ = [
+    "kicks_queued",
+    "queue_kick",
+    "list_due_kicks",
+    "complete_kick",
+    "reschedule_kick",
+    "postpone_kick",
+]
+
+# Set when new kicks are queued so the worker doesn't wait for its interval
+kicks_queued = asyncio.Event()
+
+
+async def queue_kick(user_id: int, chat_id: int) -> None:
+    """Persist a pending removal of ``user_id`` from ``chat_id``."""
+    now = datetime.datetime.utcnow().isoformat()
+    await run_write(
+        "INSERT OR IGNORE INTO pending_kick (chat_id, user_id, next_attempt_at, created_at) "
+        "VALUES (?, ?, ?, ?)",
+        [(chat_id, user_id, now, now)],
+    )
+    kicks_queued.set()
+
+
+async def list_due_kicks(limit: int) -> list[PendingKick]:
+    """Return up to ``limit`` kicks whose next attempt is due."""
+    db = get_db()
+    now = datetime.datetime.utcnow().isoformat()
+    async with db.execute(
+        "SELECT chat_id, user_id, attempts, next_attempt_at FROM pending_kick "
+        "WHERE next_attempt_at<=? ORDER BY next_attempt_at LIMIT ?",
+        (now, limit),
+    ) as cur:
+        rows = await cur.fetchall()
+    return [
+        PendingKick(
+            chat_id=row["chat_id"],
+            user_id=row["user_id"],
+            attempts=row["attempts"],
+            next_attempt_at=datetime.datetime.fromisoformat(row["next_attempt_at"]),
+        )
+        for row in rows
+    ]
+
+
+async def complete_kick(chat_id: int, user_id: int) -> None:
+    """Drop a kick that was carried out or is no longer needed."""
+    await run_write(
+        "DELETE FROM pending_kick WHERE chat_id=? AND user_id=?", [(chat_id, user_id)]
+    )
+
+
+async def reschedule_kick(chat_id: int, user_id: int, delay: float) -> None:
+    """Count a failed attempt and retry the kick after ``delay`` seconds."""
+    next_attempt = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+    await run_write(
+        "UPDATE pending_kick SET attempts=attempts+1, next_attempt_at=? "
+        "WHERE chat_id=? AND user_id=?",
+        [(next_attempt.isoformat(), chat_id, user_id)],
+    )
+
+
+async def postpone_kick(chat_id: int, user_id: int, delay: float) -> None:
+    """Retry the kick after ``delay`` seconds without counting an attempt, e.g. a flood wait."""
+    next_attempt = datetime.datetime.utcnow() + datetime.timedelta(seconds=delay)
+    await run_write(
+        "UPDATE pending_kick SET next_attempt_at=? WHERE chat_id=? AND user_id=?",
+        [(next_attempt.isoformat(), chat_id, user_id)],
+    )
@@ -0,0 +1,43 @@
+import csv
+import gzip
+from pathlib import Path
+from typing import Iterable
+
+from database import open_snapshot
+
+__all__ = ["EXPORT_TABLES", "export_tables"]
+
+# Export name -> table
+EXPORT_TABLES = {
+    "users": "user",
+    "subscriptions": "subscription",
+    "tokens": "token",
+}
+
+
+async def export_tables(
+    names: Iterable[str], directory: Path, compress: bool = False
+) -> list[Path]:
+    """Stream the given tables to CSV files in ``directory``.
+
+    All tables are read from the same snapshot and rows are written as they
+    are fetched, so memory use doesn't depend on the table size.
+    """
+    paths: list[Path] = []
+    async with open_snapshot() as db:
+        for name in names:
+            table = EXPORT_TABLES[name]
+            path = directory / (f"{name}.csv.gz" if compress else f"{name}.csv")
+            async with db.execute(f"SELECT * FROM {table} ORDER BY rowid") as cursor:
+                header = [col[0] for col in cursor.description]
+                if compress:
+                    fh = gzip.open(path, "wt", newline="", encoding="utf-8")
+                else:
+                    fh = open(path, "w", newline="", encoding="utf-8")
+                with fh:
+                    writer = csv.writer(fh)
+                    writer.writerow(header)
+                    async for row in cursor:
+                        writer.writerow(tuple(row))
+            paths.append(path)
+    return paths
@@ -0,0 +1,172 @@
+import asyncio
+import datetime
+import logging
+import sqlite3
+from typing import Optional
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from bot import get_bot
+from config import settings
+from database import get_db, run_batch, run_write
+from utils.rate_limiter import TenantRateLimiter
+
+__all__ = [
+    "CLAIM_MARGIN",
+    "pool_changed",
+    "invite_limiter",
+    "get_invite_link",
+    "claim_invite_link",
+    "count_available_links",
+    "create_invite_link",
+    "store_invite_links",
+    "list_stale_links",
+    "mark_links_revoked",
+    "purge_old_links",
+]
+
+logger = logging.getLogger(__name__)
+
+# A pooled link must stay valid at least this long after being handed out
+CLAIM_MARGIN = datetime.timedelta(hours=1)
+
+# Set whenever a link is claimed so the pool task refills right away
+pool_changed = asyncio.Event()
+
+# Invite-link management calls are limited per chat well below messages
+invite_limiter = TenantRateLimiter(20, 60.0)
+
+
+def _claim_sync(
+    conn: sqlite3.Connection, user_id: int, chat_id: int, now: datetime.datetime
+) -> Optional[str]:
+    min_expiry = (now + CLAIM_MARGIN).isoformat()
+    with conn:
+        row = conn.execute(
+            "SELECT link FROM invite_link "
+            "WHERE chat_id=? AND user_id IS NULL AND revoked=0 AND expires_at>? "
+            "ORDER BY expires_at DESC LIMIT 1",
+            (chat_id, min_expiry),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            "UPDATE invite_link SET user_id=?, claimed_at=? WHERE link=?",
+            (user_id, now.isoformat(), row["link"]),
+        )
+    return str(row["link"])
+
+
+async def claim_invite_link(user_id: int, chat_id: int) -> Optional[str]:
+    """Hand out a free pooled link to ``user_id``; ``None`` if the pool is empty."""
+    # Select and update run back to back on the connection thread, so no
+    # other handler can claim the same link in between
+    link = await run_batch(_claim_sync, user_id, chat_id, datetime.datetime.utcnow())
+    pool_changed.set()
+    return link
+
+
+async def get_invite_link(user_id: int) -> Optional[str]:
+    """Return a single-use invite link to the channel for ``user_id``.
+
+    Links come from the pre-created pool; one is only created inline when
+    the pool has run dry. Returns ``None`` if no channel is configured or
+    Telegram refuses the inline link (flood wait, bot not a channel admin),
+    so callers can still confirm the subscription.
+    """
+    chat_id = settings.current.CHANNEL_ID
+    if chat_id is None:
+        return None
+    link = await claim_invite_link(user_id, chat_id)
+    if link is not None:
+        return link
+    try:
+        link, expires_at = await create_invite_link(
+            chat_id, datetime.timedelta(hours=settings.INVITE_LINK_TTL_HOURS), retry=False
+        )
+    except TelegramAPIError:
+        logger.exception("Could not create an invite link for %s", user_id)
+        return None
+    now = datetime.datetime.utcnow().isoformat()
+    await run_write(
+        "INSERT INTO invite_link (link, chat_id, created_at, expires_at, user_id, claimed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [(link, chat_id, now, expires_at.isoformat(), user_id, now)],
+    )
+    return link
+
+
+async def count_available_links(chat_id: int) -> int:
+    """Return how many pooled links can still be handed out."""
+    db = get_db()
+    min_expiry = (datetime.datetime.utcnow() + CLAIM_MARGIN).isoformat()
+    async with db.execute(
+        "SELECT COUNT(*) FROM invite_link "
+        "WHERE chat_id=? AND user_id IS NULL AND revoked=0 AND expires_at>?",
+        (chat_id, min_expiry),
+    ) as cur:
+        row = await cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+async def create_invite_link(
+    chat_id: int, ttl: datetime.timedelta, retry: bool = True
+) -> tuple[str, datetime.datetime]:
+    """Create a single-use invite link in Telegram under the rate limit.
+
+    Flood waits are waited out and retried unless ``retry`` is False, in
+    which case the ``TelegramRetryAfter`` is raised to the caller.
+    """
+    expires_at = datetime.datetime.utcnow() + ttl
+    while True:
+        await invite_limiter.acquire()
+        try:
+            invite = await get_bot().create_chat_invite_link(
+                chat_id,
+                expire_date=expires_at.replace(tzinfo=datetime.timezone.utc),
+                member_limit=1,
+            )
+        except TelegramRetryAfter as exc:
+            invite_limiter.penalize(exc.retry_after)
+            if not retry:
+                raise
+            continue
+        return invite.invite_link, expires_at
+
+
+async def store_invite_links(
+    chat_id: int, links: list[tuple[str, datetime.datetime]]
+) -> None:
+    """Add freshly created ``(link, expires_at)`` pairs to the pool."""
+    now = datetime.datetime.utcnow().isoformat()
+    await run_write(
+        "INSERT OR IGNORE INTO invite_link (link, chat_id, created_at, expires_at) "
+        "VALUES (?, ?, ?, ?)",
+        [(link, chat_id, now, expires_at.isoformat()) for link, expires_at in links],
+    )
+
+
+async def list_stale_links(chat_id: int, limit: int) -> list[str]:
+    """Return unclaimed links too close to expiry to be handed out."""
+    db = get_db()
+    min_expiry = (datetime.datetime.utcnow() + CLAIM_MARGIN).isoformat()
+    async with db.execute(
+        "SELECT link FROM invite_link "
+        "WHERE chat_id=? AND user_id IS NULL AND revoked=0 AND expires_at<=? LIMIT ?",
+        (chat_id, min_expiry, limit),
+    ) as cur:
+        rows = await cur.fetchall()
+    return [str(row["link"]) for row in rows]
+
+
+async def mark_links_revoked(links: list[str]) -> None:
+    """Flag the given links as revoked in one transaction."""
+    await run_write(
+        "UPDATE invite_link SET revoked=1 WHERE link=?", [(link,) for link in links]
+    )
+
+
+async def purge_old_links(older_than: datetime.timedelta) -> None:
+    """Delete links that expired more than ``older_than`` ago."""
+    cutoff = (datetime.datetime.utcnow() - older_than).isoformat()
+    await run_write("DELETE FROM invite_link WHERE expires_at<?", [(cutoff,)])
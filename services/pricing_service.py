@@ -0,0 +1,166 @@
+import datetime
+import sqlite3
+from typing import Optional
+
+from database import get_db, run_batch
+from database.models import Price
+from services.config_service import get_config
+from utils.tenancy import current_tenant
+
+__all__ = [
+    "PERIOD_DAYS",
+    "DEFAULT_CURRENCY",
+    "period_days",
+    "get_currency",
+    "list_prices",
+    "get_price",
+    "set_price",
+    "estimate_revenue",
+    "migrate_legacy_prices",
+]
+
+# Subscription period codes and the token duration each one covers
+PERIOD_DAYS = {
+    "1d": 1,
+    "1w": 7,
+    "2w": 14,
+    "1m": 30,
+    "perm": 36500,
+}
+
+DEFAULT_CURRENCY = "USD"
+
+# tenant -> (period, currency) -> Price, loaded lazily and refreshed on writes
+_cache: dict[str, dict[tuple[str, str], Price]] = {}
+
+
+def period_days(period: str) -> Optional[int]:
+    """Return the duration in days for a period code such as ``1m`` or ``90d``."""
+    if period in PERIOD_DAYS:
+        return PERIOD_DAYS[period]
+    if period.endswith("d") and period[:-1].isdigit() and int(period[:-1]) > 0:
+        return int(period[:-1])
+    return None
+
+
+async def get_currency() -> str:
+    """Return the configured currency code."""
+    return await get_config("currency") or DEFAULT_CURRENCY
+
+
+async def _load() -> dict[tuple[str, str], Price]:
+    prices = _cache.get(current_tenant.get())
+    if prices is None:
+        db = get_db()
+        async with db.execute(
+            "SELECT period, currency, amount, duration_days FROM pricing"
+        ) as cur:
+            rows = await cur.fetchall()
+        prices = _cache[current_tenant.get()] = {
+            (row["period"], row["currency"]): Price(
+                period=row["period"],
+                currency=row["currency"],
+                amount=float(row["amount"]),
+                duration_days=int(row["duration_days"]),
+            )
+            for row in rows
+        }
+    return prices
+
+
+async def list_prices(currency: Optional[str] = None) -> list[Price]:
+    """Return all prices, optionally only those in ``currency``, by duration."""
+    prices = (await _load()).values()
+    if currency is not None:
+        prices = [p for p in prices if p.currency == currency]
+    return sorted(prices, key=lambda p: (p.currency, p.duration_days))
+
+
+async def get_price(period: str, currency: Optional[str] = None) -> Optional[Price]:
+    """Return the price for the given period, if set."""
+    currency = currency or await get_currency()
+    return (await _load()).get((period, currency))
+
+
+def _set_price_sync(
+    conn: sqlite3.Connection, period: str, currency: str, amount: float, days: int
+) -> None:
+    with conn:
+        conn.execute(
+            "DELETE FROM pricing WHERE duration_days=? AND currency=? AND period<>?",
+            (days, currency, period),
+        )
+        conn.execute(
+            "INSERT INTO pricing (period, currency, amount, duration_days) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(period, currency) DO UPDATE SET "
+            "amount=excluded.amount, duration_days=excluded.duration_days",
+            (period, currency, amount, days),
+        )
+
+
+async def set_price(period: str, amount: float, currency: Optional[str] = None) -> Price:
+    """Store the price for a period; raise ``ValueError`` for unknown periods.
+
+    Each duration has a single price per currency, so setting ``1m``
+    replaces a ``30d`` price and vice versa.
+    """
+    days = period_days(period)
+    if days is None:
+        raise ValueError(f"Unknown subscription period: {period}")
+    currency = currency or await get_currency()
+    await run_batch(_set_price_sync, period, currency, amount, days)
+    price = Price(period=period, currency=currency, amount=amount, duration_days=days)
+    prices = await _load()
+    for key, other in list(prices.items()):
+        if other.duration_days == days and other.currency == currency:
+            del prices[key]
+    prices[(period, currency)] = price
+    return price
+
+
+async def estimate_revenue(
+    currency: Optional[str] = None,
+) -> tuple[float, list[tuple[str, int, float]]]:
+    """Return total and per-period ``(period, subscribers, revenue)`` estimates.
+
+    Active subscriptions are priced by the duration of their latest grant;
+    durations without a price in ``currency`` are not counted.
+    """
+    currency = currency or await get_currency()
+    db = get_db()
+    now = datetime.datetime.utcnow().isoformat()
+    # Prices stored before set_price kept one per duration may still repeat a
+    # duration (1m and 30d); only the newest of them counts
+    async with db.execute(
+        "SELECT p.period, COUNT(*) AS subs, SUM(p.amount) AS revenue "
+        "FROM subscription s JOIN ("
+        "SELECT period, amount, duration_days, "
+        "ROW_NUMBER() OVER (PARTITION BY duration_days ORDER BY rowid DESC) AS n "
+        "FROM pricing WHERE currency=?) p "
+        "ON p.duration_days=s.duration_days AND p.n=1 "
+        "WHERE s.end_date>? GROUP BY p.period ORDER BY revenue DESC",
+        (currency, now),
+    ) as cur:
+        rows = await cur.fetchall()
+    breakdown = [(row["period"], int(row["subs"]), float(row["revenue"])) for row in rows]
+    return sum(r for _, _, r in breakdown), breakdown
+
+
+async def migrate_legacy_prices() -> None:
+    """Copy prices stored as ``price_*`` config keys into the pricing table."""
+    if await _load():
+        return
+    legacy: dict[str, str] = {}
+    for period in PERIOD_DAYS:
+        amount = await get_config(f"price_{period}")
+        if amount is not None:
+            legacy[period] = amount
+    period = await get_config("price_period")
+    amount = await get_config("price_amount")
+    if period is not None and amount is not None:
+        legacy.setdefault(period, amount)
+    for period, amount in legacy.items():
+        try:
+            await set_price(period, float(amount))
+        except ValueError:
+            continue
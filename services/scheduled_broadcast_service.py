@@ -0,0 +1,270 @@
+import asyncio
+import datetime
+import json
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from config import settings
+from database import get_db, open_snapshot, run_batch
+from database.models import BroadcastDelivery, ScheduledBroadcast
+from services.config_service import get_config
+
+__all__ = [
+    "SLOT_SECONDS",
+    "ScheduleResult",
+    "deliveries_scheduled",
+    "schedule_broadcast",
+    "get_scheduled_broadcast",
+    "list_due_deliveries",
+    "complete_deliveries",
+    "next_due_at",
+    "purge_deliveries",
+]
+
+# Deliveries are grouped into slots of this length, each holding at most
+# BROADCAST_SLOT_CAPACITY sends; overflow moves to the following slot
+SLOT_SECONDS = 60
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# Set when deliveries are scheduled so the scheduler recomputes its wake-up time
+deliveries_scheduled = asyncio.Event()
+
+
+@dataclass
+class ScheduleResult:
+    broadcast_id: int
+    recipients: int
+    first_due: Optional[datetime.datetime]
+    last_due: Optional[datetime.datetime]
+
+
+def _zone(name: Optional[str], default: ZoneInfo) -> ZoneInfo:
+    if not name:
+        return default
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return default
+
+
+def _target_utc(
+    local_time: datetime.time,
+    date: Optional[datetime.date],
+    tz: ZoneInfo,
+    now: datetime.datetime,
+) -> datetime.datetime:
+    """Return when ``local_time`` next occurs in ``tz`` (on ``date`` if given), in UTC."""
+    local_now = now.replace(tzinfo=datetime.timezone.utc).astimezone(tz)
+    target = datetime.datetime.combine(date or local_now.date(), local_time, tzinfo=tz)
+    if date is None and target <= local_now:
+        target = datetime.datetime.combine(
+            local_now.date() + datetime.timedelta(days=1), local_time, tzinfo=tz
+        )
+    return max(target.astimezone(datetime.timezone.utc).replace(tzinfo=None), now)
+
+
+def _slot(moment: datetime.datetime) -> datetime.datetime:
+    return moment - (moment - _EPOCH) % datetime.timedelta(seconds=SLOT_SECONDS)
+
+
+async def _slot_load(since: datetime.datetime) -> Counter:
+    """Return pending deliveries per slot from ``since`` on, across all broadcasts."""
+    db = get_db()
+    load: Counter = Counter()
+    async with db.execute(
+        "SELECT CAST(strftime('%s', due_at) AS INTEGER) / ? AS slot, COUNT(*) AS n "
+        "FROM broadcast_delivery WHERE sent_at IS NULL AND due_at>=? GROUP BY slot",
+        (SLOT_SECONDS, _slot(since).isoformat()),
+    ) as cur:
+        async for row in cur:
+            slot = _EPOCH + datetime.timedelta(seconds=row["slot"] * SLOT_SECONDS)
+            load[slot] = row["n"]
+    return load
+
+
+def _insert_sync(
+    conn: sqlite3.Connection, broadcast: tuple, deliveries: list[tuple[int, str]]
+) -> int:
+    """Store a broadcast and its deliveries in one transaction; return its ID."""
+    with conn:
+        broadcast_id = conn.execute(
+            "INSERT INTO scheduled_broadcast "
+            "(created_by, created_at, local_time, text, from_chat_id, message_ids) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            broadcast,
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO broadcast_delivery (broadcast_id, user_id, due_at) VALUES (?, ?, ?)",
+            [(broadcast_id, user_id, due) for user_id, due in deliveries],
+        )
+    return broadcast_id
+
+
+async def schedule_broadcast(
+    created_by: int,
+    local_time: datetime.time,
+    date: Optional[datetime.date] = None,
+    text: Optional[str] = None,
+    from_chat_id: Optional[int] = None,
+    message_ids: Optional[list[int]] = None,
+) -> ScheduleResult:
+    """Schedule a message for every active subscriber at ``local_time`` in their timezone.
+
+    Without ``date`` each subscriber gets it at the next occurrence of
+    ``local_time``. Sends are spread over slots holding at most
+    ``BROADCAST_SLOT_CAPACITY`` deliveries, counting other pending
+    broadcasts, so big audiences in one timezone don't hit Telegram at once.
+    Everything is persisted and survives restarts.
+    """
+    now = datetime.datetime.utcnow()
+    default_tz = _zone(await get_config("timezone"), ZoneInfo("UTC"))
+    capacity = max(settings.BROADCAST_SLOT_CAPACITY, 1)
+    spacing = SLOT_SECONDS / capacity
+
+    # Read recipients from a snapshot so the scan doesn't hold up handlers
+    targets: list[tuple[datetime.datetime, int]] = []
+    async with open_snapshot() as snap:
+        async with snap.execute(
+            "SELECT s.user_id, u.timezone FROM subscription s "
+            "LEFT JOIN user u ON u.id=s.user_id WHERE s.end_date>?",
+            (now.isoformat(),),
+        ) as cur:
+            async for row in cur:
+                tz = _zone(row["timezone"], default_tz)
+                targets.append((_target_utc(local_time, date, tz, now), row["user_id"]))
+    targets.sort()
+
+    # Each slot hands out evenly spaced send times after what other broadcasts
+    # already booked; a full slot spills into the next one
+    load = await _slot_load(now)
+    step = datetime.timedelta(seconds=spacing)
+    length = datetime.timedelta(seconds=SLOT_SECONDS)
+    cursor: dict[datetime.datetime, datetime.datetime] = {}
+    deliveries: list[tuple[int, str]] = []
+    for target, user_id in targets:
+        slot = _slot(target)
+        while True:
+            due = max(target, cursor.get(slot, slot + load[slot] * step))
+            if due < slot + length:
+                break
+            slot += length
+        cursor[slot] = due + step
+        deliveries.append((user_id, due.isoformat()))
+
+    broadcast_id = await run_batch(
+        _insert_sync,
+        (
+            created_by,
+            now.isoformat(),
+            local_time.strftime("%H:%M"),
+            text,
+            from_chat_id,
+            json.dumps(message_ids or []),
+        ),
+        deliveries,
+    )
+    deliveries_scheduled.set()
+
+    dues = sorted(due for _, due in deliveries)
+    return ScheduleResult(
+        broadcast_id=broadcast_id,
+        recipients=len(deliveries),
+        first_due=datetime.datetime.fromisoformat(dues[0]) if dues else None,
+        last_due=datetime.datetime.fromisoformat(dues[-1]) if dues else None,
+    )
+
+
+async def get_scheduled_broadcast(broadcast_id: int) -> Optional[ScheduledBroadcast]:
+    """Return a scheduled broadcast by ID."""
+    db = get_db()
+    async with db.execute(
+        "SELECT id, created_by, created_at, local_time, text, from_chat_id, message_ids "
+        "FROM scheduled_broadcast WHERE id=?",
+        (broadcast_id,),
+    ) as cur:
+        row = await cur.fetchone()
+    if row is None:
+        return None
+    return ScheduledBroadcast(
+        id=row["id"],
+        created_by=row["created_by"],
+        created_at=datetime.datetime.fromisoformat(row["created_at"]),
+        local_time=row["local_time"],
+        text=row["text"],
+        from_chat_id=row["from_chat_id"],
+        message_ids=json.loads(row["message_ids"]),
+    )
+
+
+async def list_due_deliveries(limit: int) -> list[BroadcastDelivery]:
+    """Return up to ``limit`` pending deliveries that are due, oldest first."""
+    db = get_db()
+    now = datetime.datetime.utcnow().isoformat()
+    async with db.execute(
+        "SELECT d.broadcast_id, d.user_id, d.due_at, "
+        "EXISTS (SELECT 1 FROM subscription s WHERE s.user_id=d.user_id AND s.end_date>?) "
+        "AS active "
+        "FROM broadcast_delivery d WHERE d.sent_at IS NULL AND d.due_at<=? "
+        "ORDER BY d.due_at LIMIT ?",
+        (now, now, limit),
+    ) as cur:
+        rows = await cur.fetchall()
+    return [
+        BroadcastDelivery(
+            broadcast_id=row["broadcast_id"],
+            user_id=row["user_id"],
+            due_at=datetime.datetime.fromisoformat(row["due_at"]),
+            active=bool(row["active"]),
+        )
+        for row in rows
+    ]
+
+
+def _complete_sync(
+    conn: sqlite3.Connection, broadcast_id: int, user_ids: list[int], now: str
+) -> None:
+    with conn:
+        conn.executemany(
+            "UPDATE broadcast_delivery SET sent_at=? WHERE broadcast_id=? AND user_id=?",
+            [(now, broadcast_id, user_id) for user_id in user_ids],
+        )
+
+
+async def complete_deliveries(broadcast_id: int, user_ids: list[int]) -> None:
+    """Mark deliveries as done, whether sent, failed or skipped."""
+    now = datetime.datetime.utcnow().isoformat()
+    await run_batch(_complete_sync, broadcast_id, user_ids, now)
+
+
+async def next_due_at() -> Optional[datetime.datetime]:
+    """Return when the earliest pending delivery is due."""
+    db = get_db()
+    async with db.execute(
+        "SELECT MIN(due_at) FROM broadcast_delivery WHERE sent_at IS NULL"
+    ) as cur:
+        row = await cur.fetchone()
+    return datetime.datetime.fromisoformat(row[0]) if row and row[0] else None
+
+
+def _purge_sync(conn: sqlite3.Connection, cutoff: str) -> None:
+    with conn:
+        conn.execute(
+            "DELETE FROM broadcast_delivery WHERE broadcast_id IN ("
+            "SELECT broadcast_id FROM broadcast_delivery GROUP BY broadcast_id "
+            "HAVING COUNT(sent_at)=COUNT(*) AND MAX(sent_at)<?)",
+            (cutoff,),
+        )
+        conn.execute(
+            "DELETE FROM scheduled_broadcast WHERE created_at<? AND id NOT IN "
+            "(SELECT DISTINCT broadcast_id FROM broadcast_delivery)",
+            (cutoff,),
+        )
+
+
+async def purge_deliveries(older_than: datetime.timedelta) -> None:
+    """Delete broadcasts whose deliveries all finished more than ``older_than`` ago."""
+    cutoff = (datetime.datetime.utcnow() - older_than).isoformat()
+    await run_batch(_purge_sync, cutoff)
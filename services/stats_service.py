@@ -0,0 +1,63 @@
+import datetime
+from typing import Optional
+
+from database import get_db
+from services.subscription_service import (
+    EVENT_CREATED,
+    EVENT_EXTENDED,
+    EVENT_EXPIRED,
+    EVENT_REMOVED,
+)
+
+__all__ = [
+    "count_renewals",
+    "count_churn",
+    "most_popular_duration",
+    "count_user_renewals",
+]
+
+
+async def _sum_daily(events: tuple[str, ...], since: Optional[datetime.date]) -> int:
+    db = get_db()
+    placeholders = ",".join("?" for _ in events)
+    query = f"SELECT COALESCE(SUM(count), 0) FROM subscription_daily WHERE event IN ({placeholders})"
+    params: list = list(events)
+    if since is not None:
+        query += " AND day>=?"
+        params.append(since.isoformat())
+    async with db.execute(query, params) as cur:
+        row = await cur.fetchone()
+    return int(row[0]) if row else 0
+
+
+async def count_renewals(since: Optional[datetime.date] = None) -> int:
+    """Return the number of subscription extensions, optionally since a day."""
+    return await _sum_daily((EVENT_EXTENDED,), since)
+
+
+async def count_churn(since: Optional[datetime.date] = None) -> int:
+    """Return the number of subscriptions that expired or were removed."""
+    return await _sum_daily((EVENT_EXPIRED, EVENT_REMOVED), since)
+
+
+async def most_popular_duration() -> Optional[int]:
+    """Return the most granted subscription duration in days, if any."""
+    db = get_db()
+    async with db.execute(
+        "SELECT duration_days, SUM(count) c FROM subscription_daily "
+        "WHERE event IN (?, ?) GROUP BY duration_days ORDER BY c DESC LIMIT 1",
+        (EVENT_CREATED, EVENT_EXTENDED),
+    ) as cur:
+        row = await cur.fetchone()
+    return int(row[0]) if row else None
+
+
+async def count_user_renewals(user_id: int) -> int:
+    """Return how many times the given user's subscription was extended."""
+    db = get_db()
+    async with db.execute(
+        "SELECT COUNT(*) FROM subscription_event WHERE user_id=? AND event=?",
+        (user_id, EVENT_EXTENDED),
+    ) as cur:
+        row = await cur.fetchone()
+    return int(row[0]) if row else 0
@@ -1,87 +1,108 @@
 import datetime
-from typing import List, Optional
+from typing import AsyncIterator, Iterable, List, Optional
 
-from database import get_db
-from database.models import Subscription
+from database import get_repository
+from database.models import (
+    EVENT_CREATED,
+    EVENT_EXPIRED,
+    EVENT_EXTENDED,
+    EVENT_REMOVED,
+    Subscription,
+)
+from services.user_service import invalidate_user_context
 
 __all__ = [
+    "EVENT_CREATED",
+    "EVENT_EXTENDED",
+    "EVENT_EXPIRED",
+    "EVENT_REMOVED",
     "add_subscription",
+    "add_subscriptions",
     "get_subscription",
     "remove_subscription",
+    "remove_subscriptions",
     "list_active_subscriptions",
+    "iter_active_subscriptions",
+    "count_active_subscriptions",
+    "count_expired_subscriptions",
+    "list_expiring_subscriptions",
 ]
 
 
-async def add_subscription(user_id: int, duration_days: int) -> None:
-    """Add or extend a user's subscription."""
-    db = get_db()
-    now = datetime.datetime.utcnow()
-    async with db.execute(
-        "SELECT start_date, end_date FROM subscription WHERE user_id=?",
-        (user_id,),
-    ) as cursor:
-        row = await cursor.fetchone()
-
-    if row:
-        start = datetime.datetime.fromisoformat(row["start_date"])
-        end = datetime.datetime.fromisoformat(row["end_date"])
-        if end < now:
-            start = now
-            end = now + datetime.timedelta(days=duration_days)
-        else:
-            end = end + datetime.timedelta(days=duration_days)
-        await db.execute(
-            "UPDATE subscription SET start_date=?, end_date=? WHERE user_id=?",
-            (start.isoformat(), end.isoformat(), user_id),
-        )
-    else:
-        start = now
-        end = now + datetime.timedelta(days=duration_days)
-        await db.execute(
-            "INSERT INTO subscription (user_id, start_date, end_date) VALUES (?, ?, ?)",
-            (user_id, start.isoformat(), end.isoformat()),
-        )
-    await db.commit()
+async def add_subscription(
+    user_id: int, duration_days: int, token: Optional[str] = None
+) -> None:
+    """Add or extend a user's subscription.
+
+    ``token`` is the token that granted the days, if any, and is stored in
+    the subscription history.
+    """
+    await get_repository().grant_subscriptions(
+        [(user_id, duration_days, token)], datetime.datetime.utcnow()
+    )
+    invalidate_user_context([user_id])
+
+
+async def add_subscriptions(grants: Iterable[tuple[int, int]]) -> None:
+    """Add or extend several ``(user_id, duration_days)`` in one transaction."""
+    grants = [(user_id, duration_days, None) for user_id, duration_days in grants]
+    await get_repository().grant_subscriptions(grants, datetime.datetime.utcnow())
+    invalidate_user_context(user_id for user_id, _, _ in grants)
 
 
 async def get_subscription(user_id: int) -> Optional[Subscription]:
     """Return the subscription for the given user if it exists."""
-    db = get_db()
-    async with db.execute(
-        "SELECT user_id, start_date, end_date FROM subscription WHERE user_id=?",
-        (user_id,),
-    ) as cursor:
-        row = await cursor.fetchone()
-    if row is None:
-        return None
-    return Subscription(
-        user_id=row["user_id"],
-        start_date=datetime.datetime.fromisoformat(row["start_date"]),
-        end_date=datetime.datetime.fromisoformat(row["end_date"]),
+    return await get_repository().get_subscription(user_id)
+
+
+async def remove_subscription(user_id: int, event: str = EVENT_REMOVED) -> None:
+    """Remove a user's subscription.
+
+    ``event`` is recorded in the history; the monitor passes
+    ``EVENT_EXPIRED`` while admin removals use the default.
+    """
+    await get_repository().remove_subscriptions([user_id], event, datetime.datetime.utcnow())
+    invalidate_user_context([user_id])
+
+
+async def remove_subscriptions(
+    user_ids: Iterable[int], event: str = EVENT_REMOVED
+) -> int:
+    """Remove several subscriptions in one transaction; return how many existed."""
+    user_ids = list(user_ids)
+    removed = await get_repository().remove_subscriptions(
+        user_ids, event, datetime.datetime.utcnow()
     )
+    invalidate_user_context(user_ids)
+    return removed
+
+
+async def iter_active_subscriptions(batch_size: int = 500) -> AsyncIterator[Subscription]:
+    """Yield currently active subscriptions in ``batch_size`` keyset batches.
+
+    Only one batch is held in memory at a time, so iterating all
+    subscribers costs the same memory regardless of their number.
+    """
+    repo = get_repository()
+    async for sub in repo.iter_active_subscriptions(datetime.datetime.utcnow(), batch_size):
+        yield sub
+
+
+async def count_active_subscriptions() -> int:
+    """Return the number of currently active subscriptions."""
+    return await get_repository().count_active_subscriptions(datetime.datetime.utcnow())
+
+
+async def count_expired_subscriptions() -> int:
+    """Return the number of subscriptions that have ended but weren't removed yet."""
+    return await get_repository().count_expired_subscriptions(datetime.datetime.utcnow())
 
 
-async def remove_subscription(user_id: int) -> None:
-    """Remove a user's subscription."""
-    db = get_db()
-    await db.execute("DELETE FROM subscription WHERE user_id=?", (user_id,))
-    await db.commit()
+async def list_expiring_subscriptions(before: datetime.datetime) -> List[Subscription]:
+    """Return subscriptions ending at or before ``before``, soonest first."""
+    return await get_repository().list_expiring_subscriptions(before)
 
 
 async def list_active_subscriptions() -> List[Subscription]:
     """Return a list of currently active subscriptions."""
-    db = get_db()
-    now = datetime.datetime.utcnow().isoformat()
-    async with db.execute(
-        "SELECT user_id, start_date, end_date FROM subscription WHERE end_date>?",
-        (now,),
-    ) as cursor:
-        rows = await cursor.fetchall()
-    return [
-        Subscription(
-            user_id=row["user_id"],
-            start_date=datetime.datetime.fromisoformat(row["start_date"]),
-            end_date=datetime.datetime.fromisoformat(row["end_date"]),
-        )
-        for row in rows
-    ]
+    return [sub async for sub in iter_active_subscriptions()]
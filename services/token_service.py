@@ -1,48 +1,77 @@
+import asyncio
+import datetime
 import secrets
 from typing import Optional
 
-from database import get_db
+from database import get_repository
+from services.user_service import invalidate_user_context
 
 __all__ = [
     "generate_token",
     "validate_token",
     "mark_token_as_used",
+    "redeem_token",
+    "compact_tokens",
 ]
 
 
-async def generate_token(duration_days: int) -> str:
-    """Generate a unique token and store it in the database."""
-    db = get_db()
+async def generate_token(
+    duration_days: int, valid_for: Optional[datetime.timedelta] = None
+) -> str:
+    """Generate a unique token and store it in the database.
+
+    ``valid_for`` limits how long the token can be redeemed; by default it
+    never expires.
+    """
+    repo = get_repository()
+    now = datetime.datetime.utcnow()
+    expires_at = now + valid_for if valid_for else None
     while True:
         token = secrets.token_urlsafe(8)
-        try:
-            await db.execute(
-                "INSERT INTO token (token, duration_days, used) VALUES (?, ?, 0)",
-                (token, duration_days),
-            )
-            await db.commit()
+        # Retry with a new token if duplicate
+        if await repo.add_token(token, duration_days, now, expires_at):
             return token
-        except Exception as exc:  # aiosqlite.IntegrityError if token already exists
-            # Retry with a new token if duplicate
-            if type(exc).__name__ == "IntegrityError":
-                continue
-            raise
 
 
 async def validate_token(token: str) -> Optional[int]:
-    """Return the duration if the token exists and hasn't been used."""
-    db = get_db()
-    async with db.execute(
-        "SELECT duration_days, used FROM token WHERE token=?", (token,)
-    ) as cursor:
-        row = await cursor.fetchone()
-    if row is None or row["used"]:
+    """Return the duration if the token exists, hasn't been used and hasn't expired."""
+    stored = await get_repository().get_token(token)
+    if stored is None or stored.used:
+        return None
+    if stored.expires_at is not None and stored.expires_at <= datetime.datetime.utcnow():
         return None
-    return int(row["duration_days"])
+    return stored.duration_days
 
 
 async def mark_token_as_used(token: str) -> None:
     """Mark a token as used."""
-    db = get_db()
-    await db.execute("UPDATE token SET used=1 WHERE token=?", (token,))
-    await db.commit()
+    await get_repository().mark_token_used(token, datetime.datetime.utcnow())
+
+
+async def redeem_token(token: str, user_id: int) -> Optional[int]:
+    """Consume ``token`` and grant its days to ``user_id`` in one transaction.
+
+    Returns the granted days, or None if the token is unknown, used or
+    expired. Two users racing for the same token can't both redeem it.
+    """
+    duration = await get_repository().redeem_token(token, user_id, datetime.datetime.utcnow())
+    if duration is not None:
+        invalidate_user_context([user_id])
+    return duration
+
+
+async def compact_tokens(retention: datetime.timedelta, batch_size: int = 500) -> int:
+    """Delete tokens used or expired more than ``retention`` ago; return how many.
+
+    Deletes run in small batches, each its own transaction, so the bot
+    keeps serving updates between them.
+    """
+    repo = get_repository()
+    cutoff = datetime.datetime.utcnow() - retention
+    deleted = 0
+    while True:
+        count = await repo.delete_stale_tokens(cutoff, cutoff, batch_size)
+        deleted += count
+        if count < batch_size:
+            return deleted
+        await asyncio.sleep(0)
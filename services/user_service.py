@@ -0,0 +1,161 @@
+import time
+import zlib
+from collections import OrderedDict
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from aiogram.types import User as TgUser
+
+from config import settings
+from database import get_repository
+from database.models import UserContext, UserMatch
+from utils.tenancy import current_tenant
+
+__all__ = [
+    "load_known_users",
+    "ensure_user",
+    "load_user_context",
+    "invalidate_user_context",
+    "resolve_users",
+    "find_user_id",
+    "search_users",
+    "count_users",
+    "get_timezone",
+    "set_timezone",
+]
+
+# tenant -> user id -> CRC32 of the stored username/full_name, for every known user
+_known: dict[str, dict[int, int]] = {}
+
+# Contexts remembered per process; the least recently used are dropped first
+USER_CONTEXT_CACHE_SIZE = 10_000
+
+# (tenant, user id) -> (monotonic expiry, context)
+_contexts: "OrderedDict[tuple[str, int], tuple[float, UserContext]]" = OrderedDict()
+# Bumped on every invalidation so a load racing with a change isn't cached
+_context_version = 0
+
+
+def _fingerprint(username: Optional[str], full_name: str) -> int:
+    return zlib.crc32(f"{username or ''}\0{full_name}".encode())
+
+
+async def load_known_users() -> int:
+    """Load the known-user index from the database; return its size."""
+    known = _known[current_tenant.get()] = {}
+    async for user in get_repository().iter_users():
+        known[user.id] = _fingerprint(user.username, user.full_name)
+    return len(known)
+
+
+async def ensure_user(tg_user: TgUser) -> bool:
+    """Store a Telegram user if new or renamed; return whether it wrote.
+
+    Repeat visits with an unchanged name are answered from memory.
+    """
+    username = tg_user.username or None
+    full_name = tg_user.full_name or ""
+    fingerprint = _fingerprint(username, full_name)
+    known = _known.setdefault(current_tenant.get(), {})
+    if known.get(tg_user.id) == fingerprint:
+        return False
+
+    await get_repository().upsert_user(tg_user.id, username, full_name)
+    known[tg_user.id] = fingerprint
+    return True
+
+
+async def load_user_context(tg_user: TgUser) -> UserContext:
+    """Return the role and subscription status of ``tg_user``, storing them if new.
+
+    Contexts come from one joined query and are cached for
+    ``USER_CONTEXT_TTL`` seconds. Subscription, admin and timezone changes
+    made through the services drop the user's cached entry right away.
+    """
+    await ensure_user(tg_user)
+    key = (current_tenant.get(), tg_user.id)
+    cached = _contexts.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        _contexts.move_to_end(key)
+        return cached[1]
+
+    version = _context_version
+    context = await get_repository().get_user_context(tg_user.id)
+    if context is None:
+        # Only possible if the user row was deleted behind the known-user index
+        context = UserContext(tg_user.id, False, None, None)
+    if version == _context_version:
+        _contexts[key] = (time.monotonic() + settings.USER_CONTEXT_TTL, context)
+        _contexts.move_to_end(key)
+        while len(_contexts) > USER_CONTEXT_CACHE_SIZE:
+            _contexts.popitem(last=False)
+    return context
+
+
+def invalidate_user_context(user_ids: Iterable[int]) -> None:
+    """Forget the cached contexts of the given users in the current tenant."""
+    global _context_version
+    _context_version += 1
+    tenant = current_tenant.get()
+    for user_id in user_ids:
+        _contexts.pop((tenant, user_id), None)
+
+
+async def resolve_users(identifiers: Iterable[str]) -> dict[str, int]:
+    """Map ``@username``/username/numeric ID strings to known user IDs.
+
+    Identifiers that don't match a user are left out of the result.
+    """
+    ids: dict[int, set[str]] = {}
+    names: dict[str, set[str]] = {}
+    for ident in identifiers:
+        value = ident.strip().lstrip("@")
+        if value.isdigit():
+            ids.setdefault(int(value), set()).add(ident)
+        elif value:
+            names.setdefault(value, set()).add(ident)
+
+    repo = get_repository()
+    resolved: dict[str, int] = {}
+    for user_id in await repo.find_user_ids(ids):
+        for ident in ids[user_id]:
+            resolved[ident] = user_id
+    for username, user_id in (await repo.find_usernames(names)).items():
+        for ident in names[username]:
+            resolved[ident] = user_id
+    return resolved
+
+
+async def find_user_id(username: str) -> Optional[int]:
+    """Return the ID of the user with the given username, if known."""
+    return (await get_repository().find_usernames([username])).get(username)
+
+
+async def search_users(
+    query: str, page: int = 0, page_size: int = 10
+) -> tuple[list[UserMatch], bool]:
+    """Return one page of users matching ``query`` and whether more pages follow."""
+    matches = await get_repository().search_users(query, page_size + 1, page * page_size)
+    return matches[:page_size], len(matches) > page_size
+
+
+async def count_users() -> int:
+    """Return the number of stored users."""
+    return await get_repository().count_users()
+
+
+async def get_timezone(user_id: int) -> Optional[str]:
+    """Return the user's timezone, or None if they haven't set one."""
+    user = await get_repository().get_user(user_id)
+    return user.timezone if user else None
+
+
+async def set_timezone(user_id: int, timezone: Optional[str]) -> None:
+    """Store the user's IANA timezone; raise ``ValueError`` for unknown names."""
+    if timezone is not None:
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"Unknown timezone: {timezone}")
+    await get_repository().set_user_timezone(user_id, timezone)
+    invalidate_user_context([user_id])
@@ -0,0 +1,177 @@
+"""Repository contract, checked against the SQLite and in-memory backends."""
+
+import asyncio
+import datetime
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import pytest
+
+from database import close_all, get_repository, init_db
+from database.memory import MemoryRepository
+from database.models import EVENT_REMOVED
+from database.repository import Repository
+from utils.tenancy import tenant_scope
+
+NOW = datetime.datetime(2026, 1, 15, 12, 0)
+DAY = datetime.timedelta(days=1)
+
+Check = Callable[[Repository], Awaitable[None]]
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def run(request: pytest.FixtureRequest, tmp_path: Path) -> Callable[[Check], None]:
+    """Return a runner calling a check with a fresh repository of each backend."""
+
+    async def with_repository(check: Check) -> None:
+        if request.param == "memory":
+            await check(MemoryRepository())
+            return
+        with tenant_scope("test"):
+            await init_db(str(tmp_path / "test.sqlite3"))
+            try:
+                await check(get_repository())
+            finally:
+                await close_all()
+
+    return lambda check: asyncio.run(with_repository(check))
+
+
+def test_upsert_user_moves_username(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        await repo.upsert_user(1, "ana", "Ana")
+        await repo.upsert_user(2, "ana", "Other Ana")
+        await repo.upsert_user(1, "ana_new", "Ana B")
+
+        first = await repo.get_user(1)
+        assert (first.username, first.full_name, first.is_admin) == ("ana_new", "Ana B", False)
+        assert (await repo.get_user(2)).username == "ana"
+        assert await repo.find_usernames(["ana", "ana_new", "nobody"]) == {"ana": 2, "ana_new": 1}
+        assert await repo.find_user_ids([1, 2, 3]) == {1, 2}
+        assert await repo.count_users() == 2
+        assert sorted([u.id async for u in repo.iter_users()]) == [1, 2]
+
+    run(check)
+
+
+def test_admins_and_timezone(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        await repo.upsert_user(1, "ana", "Ana")
+        await repo.set_admins([1, 5])
+        await repo.set_user_timezone(1, "Europe/Madrid")
+
+        assert (await repo.get_user(1)).is_admin
+        placeholder = await repo.get_user(5)
+        assert (placeholder.is_admin, placeholder.username) == (True, None)
+        context = await repo.get_user_context(1)
+        assert (context.is_admin, context.timezone, context.subscription_end) == (
+            True,
+            "Europe/Madrid",
+            None,
+        )
+        assert await repo.get_user_context(99) is None
+
+    run(check)
+
+
+def test_search_users(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        await repo.upsert_user(30, "maria_g", "María García")
+        await repo.upsert_user(10, None, "Mario Ruiz")
+        await repo.upsert_user(20, "pedro", "Pedro Mar")
+        await repo.grant_subscriptions([(10, 7, None)], NOW)
+
+        matches = await repo.search_users("mar", 10)
+        assert [m.user.id for m in matches] == [10, 20, 30]
+        assert matches[0].subscription_end == NOW + 7 * DAY
+        assert [m.user.id for m in await repo.search_users("maria garc", 10)] == [30]
+        assert [m.user.id for m in await repo.search_users("mar", 1, offset=1)] == [20]
+        # A numeric query lists that user first
+        assert [m.user.id for m in await repo.search_users("30", 10)][0] == 30
+
+    run(check)
+
+
+def test_grant_extends_active_and_restarts_expired(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        await repo.upsert_user(1, "ana", "Ana")
+        await repo.upsert_user(2, "bea", "Bea")
+        await repo.grant_subscriptions([(1, 30, None), (2, 1, None)], NOW)
+        later = NOW + 10 * DAY
+        await repo.grant_subscriptions([(1, 7, None), (2, 7, None)], later)
+
+        active = await repo.get_subscription(1)
+        assert (active.start_date, active.end_date, active.duration_days) == (NOW, NOW + 37 * DAY, 7)
+        restarted = await repo.get_subscription(2)
+        assert (restarted.start_date, restarted.end_date) == (later, later + 7 * DAY)
+        assert (await repo.get_user_context(1)).subscription_end == NOW + 37 * DAY
+
+    run(check)
+
+
+def test_active_expired_and_expiring(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        for user_id, days in [(1, 1), (2, 5), (3, 10)]:
+            await repo.upsert_user(user_id, None, str(user_id))
+            await repo.grant_subscriptions([(user_id, days, None)], NOW)
+        at = NOW + 5 * DAY
+
+        assert await repo.count_active_subscriptions(at) == 1
+        assert await repo.count_expired_subscriptions(at) == 2
+        assert [s.user_id for s in await repo.list_expiring_subscriptions(at)] == [1, 2]
+        assert [s.user_id async for s in repo.iter_active_subscriptions(at, 2)] == [3]
+
+        assert await repo.remove_subscriptions([1, 4], EVENT_REMOVED, at) == 1
+        assert await repo.get_subscription(1) is None
+        assert [s.user_id for s in await repo.list_expiring_subscriptions(at)] == [2]
+
+    run(check)
+
+
+def test_tokens(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        await repo.upsert_user(1, "ana", "Ana")
+        assert await repo.add_token("open", 30, NOW, None)
+        assert not await repo.add_token("open", 7, NOW, None)
+        assert await repo.add_token("expiring", 7, NOW, NOW + DAY)
+
+        assert await repo.redeem_token("expiring", 1, NOW + 2 * DAY) is None
+        assert await repo.redeem_token("open", 1, NOW) == 30
+        assert await repo.redeem_token("open", 1, NOW) is None
+        assert await repo.redeem_token("missing", 1, NOW) is None
+        token = await repo.get_token("open")
+        assert (token.duration_days, token.used, token.used_at) == (30, True, NOW)
+        assert (await repo.get_subscription(1)).end_date == NOW + 30 * DAY
+
+        await repo.add_token("manual", 1, NOW, None)
+        await repo.mark_token_used("manual", NOW + DAY)
+        assert (await repo.get_token("manual")).used
+
+    run(check)
+
+
+def test_delete_stale_tokens(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        await repo.add_token("used", 1, NOW, None)
+        await repo.mark_token_used("used", NOW)
+        await repo.add_token("expired", 1, NOW, NOW + DAY)
+        await repo.add_token("fresh", 1, NOW, None)
+        cutoff = NOW + 2 * DAY
+
+        assert await repo.delete_stale_tokens(cutoff, cutoff, 1) == 1
+        assert await repo.delete_stale_tokens(cutoff, cutoff, 10) == 1
+        assert await repo.get_token("used") is None
+        assert await repo.get_token("expired") is None
+        assert await repo.get_token("fresh") is not None
+
+    run(check)
+
+
+def test_config(run: Callable[[Check], None]) -> None:
+    async def check(repo: Repository) -> None:
+        assert await repo.get_config("currency") is None
+        await repo.set_config("currency", "EUR")
+        await repo.set_config("currency", "USD")
+        assert await repo.get_config("currency") == "USD"
+
+    run(check)
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from config import settings
+from services.backup_service import backup_database
+from utils.tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+
+async def _backup_tenant() -> None:
+    try:
+        result = await backup_database(
+            Path(settings.BACKUP_DIR),
+            compress=settings.BACKUP_COMPRESS,
+            keep=settings.BACKUP_KEEP,
+        )
+    except Exception:
+        logger.exception("Backup of %s failed", settings.current.NAME)
+        return
+    if result.ok:
+        logger.info(
+            "Backup of %s: %s (%d pages, %d bytes) in %.1fs",
+            settings.current.NAME,
+            result.path,
+            result.pages,
+            result.size,
+            result.elapsed,
+        )
+    else:
+        logger.error(
+            "Backup of %s failed its integrity check: %s", settings.current.NAME, result.integrity
+        )
+
+
+async def schedule_backups() -> None:
+    """Background task backing up every tenant's database periodically."""
+    if settings.BACKUP_INTERVAL_HOURS <= 0:
+        return
+    while True:
+        await asyncio.sleep(settings.BACKUP_INTERVAL_HOURS * 60 * 60)
+        for tenant in settings.TENANTS:
+            with tenant_scope(tenant.NAME):
+                await _backup_tenant()
@@ -0,0 +1,86 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+from collections import defaultdict
+
+from config import settings
+from services.broadcast_service import deliver, message_sender
+from services.scheduled_broadcast_service import (
+    complete_deliveries,
+    deliveries_scheduled,
+    get_scheduled_broadcast,
+    list_due_deliveries,
+    next_due_at,
+    purge_deliveries,
+)
+from utils.tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+CHECK_INTERVAL = 5 * 60
+# Seconds before a tenant whose pass failed is tried again
+RETRY_INTERVAL = 60
+# Finished broadcasts are kept this long for reference, checked hourly
+RETENTION = datetime.timedelta(days=30)
+PURGE_INTERVAL = 60 * 60
+
+_last_purge: dict[str, float] = {}
+
+
+async def _send_due() -> int:
+    """Send every due delivery of the current tenant; return how many were sent."""
+    sent = 0
+    while True:
+        due = await list_due_deliveries(BATCH_SIZE)
+        if not due:
+            return sent
+        by_broadcast: dict[int, list[int]] = defaultdict(list)
+        skipped: dict[int, list[int]] = defaultdict(list)
+        for delivery in due:
+            # Subscribers who lapsed since scheduling don't get the message
+            target = by_broadcast if delivery.active else skipped
+            target[delivery.broadcast_id].append(delivery.user_id)
+        for broadcast_id, user_ids in skipped.items():
+            await complete_deliveries(broadcast_id, user_ids)
+        for broadcast_id, user_ids in by_broadcast.items():
+            job = await get_scheduled_broadcast(broadcast_id)
+            if job is not None:
+                send, cost = message_sender(job.text, job.from_chat_id, job.message_ids)
+                result = await deliver(user_ids, send, cost)
+                sent += result.sent
+            # Marked after sending: a crash mid-batch re-sends it rather than dropping it
+            await complete_deliveries(broadcast_id, user_ids)
+
+
+async def _run_tenant() -> float:
+    """Send the tenant's due deliveries; return seconds until the next one."""
+    sent = await _send_due()
+    if sent:
+        logger.info("Scheduled broadcasts %s: %d sent", settings.current.NAME, sent)
+    if time.monotonic() - _last_purge.get(settings.current.NAME, 0.0) > PURGE_INTERVAL:
+        await purge_deliveries(RETENTION)
+        _last_purge[settings.current.NAME] = time.monotonic()
+    upcoming = await next_due_at()
+    if upcoming is None:
+        return CHECK_INTERVAL
+    return (upcoming - datetime.datetime.utcnow()).total_seconds()
+
+
+async def run_broadcast_scheduler() -> None:
+    """Background task delivering scheduled broadcasts for every tenant."""
+    while True:
+        deliveries_scheduled.clear()
+        wait = CHECK_INTERVAL
+        for tenant in settings.TENANTS:
+            with tenant_scope(tenant.NAME):
+                try:
+                    wait = min(wait, await _run_tenant())
+                except Exception:
+                    # Deliveries stay pending in the database and are retried
+                    logger.exception("Scheduled broadcasts failed for %s", tenant.NAME)
+                    wait = min(wait, RETRY_INTERVAL)
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(deliveries_scheduled.wait(), max(wait, 1))
@@ -0,0 +1,93 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+
+from bot import get_bot
+from config import settings
+from services.invite_service import (
+    count_available_links,
+    create_invite_link,
+    invite_limiter,
+    list_stale_links,
+    mark_links_revoked,
+    pool_changed,
+    purge_old_links,
+    store_invite_links,
+)
+from utils.tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+# Links revoked per batch and how often the pool is checked without claims
+REVOKE_BATCH = 20
+CHECK_INTERVAL = 15 * 60
+
+
+async def _revoke_stale_links(chat_id: int) -> int:
+    """Revoke unclaimed links that are about to expire, one batch at a time."""
+    revoked = 0
+    while True:
+        links = await list_stale_links(chat_id, REVOKE_BATCH)
+        if not links:
+            return revoked
+        for link in links:
+            while True:
+                await invite_limiter.acquire()
+                try:
+                    await get_bot().revoke_chat_invite_link(chat_id, link)
+                except TelegramRetryAfter as exc:
+                    invite_limiter.penalize(exc.retry_after)
+                    continue
+                except TelegramAPIError:
+                    # Already expired or revoked on Telegram's side
+                    pass
+                break
+        await mark_links_revoked(links)
+        revoked += len(links)
+
+
+async def _refill_pool(chat_id: int) -> int:
+    """Create links until the pool holds ``INVITE_POOL_SIZE`` usable ones."""
+    missing = settings.INVITE_POOL_SIZE - await count_available_links(chat_id)
+    ttl = datetime.timedelta(hours=settings.INVITE_LINK_TTL_HOURS)
+    created = 0
+    while created < missing:
+        link = await create_invite_link(chat_id, ttl)
+        # Store as we go so a crash mid-refill doesn't leak created links
+        await store_invite_links(chat_id, [link])
+        created += 1
+    return created
+
+
+async def _maintain_tenant_pool(chat_id: int) -> None:
+    try:
+        revoked = await _revoke_stale_links(chat_id)
+        created = await _refill_pool(chat_id)
+        await purge_old_links(datetime.timedelta(days=7))
+        if revoked or created:
+            logger.info(
+                "Invite pool %s: %d created, %d revoked",
+                settings.current.NAME,
+                created,
+                revoked,
+            )
+    except Exception:
+        # Telegram or database errors; the next wake-up tries again
+        logger.exception("Invite pool maintenance failed for %s", settings.current.NAME)
+
+
+async def maintain_invite_pool() -> None:
+    """Background task keeping every tenant's invite-link pool full."""
+    tenants = [t for t in settings.TENANTS if t.CHANNEL_ID is not None]
+    if not tenants:
+        return
+    while True:
+        pool_changed.clear()
+        for tenant in tenants:
+            with tenant_scope(tenant.NAME):
+                await _maintain_tenant_pool(tenant.CHANNEL_ID)
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(pool_changed.wait(), CHECK_INTERVAL)
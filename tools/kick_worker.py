@@ -0,0 +1,157 @@
+import asyncio
+import contextlib
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+
+from bot import get_bot
+from config import settings
+from database import get_db
+from database.models import PendingKick
+from services.enforcement_service import (
+    complete_kick,
+    kicks_queued,
+    list_due_kicks,
+    postpone_kick,
+    reschedule_kick,
+)
+from utils.rate_limiter import telegram_limiter
+from utils.tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = 5
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 8
+CHECK_INTERVAL = 5 * 60
+
+# Bad Request descriptions meaning the user is no longer in the chat
+_GONE_ERRORS = (
+    "user not found",
+    "user_not_participant",
+    "participant_id_invalid",
+    "member not found",
+)
+
+
+@dataclass
+class KickRunStats:
+    kicked: int = 0
+    already_gone: int = 0
+    skipped: int = 0
+    retried: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def per_second(self) -> float:
+        done = self.kicked + self.already_gone
+        return done / self.elapsed if self.elapsed else 0.0
+
+
+async def _should_skip(user_id: int) -> bool:
+    """Return True for admins and users who renewed since being queued."""
+    db = get_db()
+    now = datetime.datetime.utcnow().isoformat()
+    async with db.execute(
+        "SELECT 1 FROM user WHERE id=? AND is_admin=1 "
+        "UNION ALL SELECT 1 FROM subscription WHERE user_id=? AND end_date>? LIMIT 1",
+        (user_id, user_id, now),
+    ) as cur:
+        return await cur.fetchone() is not None
+
+
+async def _kick(kick: PendingKick, stats: KickRunStats) -> None:
+    if await _should_skip(kick.user_id):
+        await complete_kick(kick.chat_id, kick.user_id)
+        stats.skipped += 1
+        return
+    try:
+        await telegram_limiter.acquire()
+        await get_bot().ban_chat_member(kick.chat_id, kick.user_id)
+        await telegram_limiter.acquire()
+        # Unbanning right away turns the ban into a kick so the user can rejoin
+        await get_bot().unban_chat_member(kick.chat_id, kick.user_id, only_if_banned=True)
+    except TelegramRetryAfter as exc:
+        telegram_limiter.penalize(exc.retry_after)
+        # Flood waits say nothing about this kick, so they don't use up its attempts
+        await postpone_kick(kick.chat_id, kick.user_id, exc.retry_after)
+        stats.retried += 1
+        return
+    except TelegramBadRequest as exc:
+        if any(err in exc.message.lower() for err in _GONE_ERRORS):
+            await complete_kick(kick.chat_id, kick.user_id)
+            stats.already_gone += 1
+            return
+        await _fail(kick, stats, exc)
+        return
+    except TelegramAPIError as exc:
+        await _fail(kick, stats, exc)
+        return
+    await complete_kick(kick.chat_id, kick.user_id)
+    stats.kicked += 1
+
+
+async def _fail(kick: PendingKick, stats: KickRunStats, exc: TelegramAPIError) -> None:
+    if kick.attempts + 1 >= MAX_ATTEMPTS:
+        logger.warning("Giving up kicking %s from %s: %s", kick.user_id, kick.chat_id, exc)
+        await complete_kick(kick.chat_id, kick.user_id)
+        stats.failed += 1
+        return
+    # Exponential backoff: 1, 2, 4 ... minutes
+    await reschedule_kick(kick.chat_id, kick.user_id, 60 * 2**kick.attempts)
+    stats.retried += 1
+
+
+async def enforce_expired() -> KickRunStats:
+    """Process every due kick with bounded concurrency and report the run."""
+    stats = KickRunStats()
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def run(kick: PendingKick) -> None:
+        async with semaphore:
+            await _kick(kick, stats)
+
+    while True:
+        due = await list_due_kicks(BATCH_SIZE)
+        if not due:
+            break
+        await asyncio.gather(*(run(kick) for kick in due))
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+async def _run_tenant() -> None:
+    stats = await enforce_expired()
+    if stats.kicked or stats.already_gone or stats.retried or stats.failed:
+        logger.info(
+            "Expiry enforcement %s: %d kicked, %d already gone, %d skipped, "
+            "%d retried, %d failed in %.1fs (%.1f/s)",
+            settings.current.NAME,
+            stats.kicked,
+            stats.already_gone,
+            stats.skipped,
+            stats.retried,
+            stats.failed,
+            stats.elapsed,
+            stats.per_second,
+        )
+
+
+async def run_kick_worker() -> None:
+    """Background task draining every tenant's persisted kick queue."""
+    while True:
+        kicks_queued.clear()
+        for tenant in settings.TENANTS:
+            with tenant_scope(tenant.NAME):
+                try:
+                    await _run_tenant()
+                except Exception:
+                    # Pending kicks stay queued and are retried on the next wake-up
+                    logger.exception("Expiry enforcement failed for %s", tenant.NAME)
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(kicks_queued.wait(), CHECK_INTERVAL)
@@ -0,0 +1,353 @@
+"""Replay an update log recorded with RECORD_UPDATES and report handler latency.
+
+    python -m tools.replay updates.jsonl [--speed 10] [--seed [tenant=]backup.sqlite3[.gz]]
+        [--json report.json]
+
+Updates go through the real dispatcher, middlewares and a fresh database
+per tenant. ``--seed`` copies a database (e.g. a backup, gzipped or not)
+into every tenant, or into one with ``tenant=path``; it can be repeated.
+Seeded users keep their real IDs while the log's senders are pseudonyms,
+so recorded users never match seeded ones: a seed reproduces table sizes
+and query plans, not the recorded users' own subscriptions. Telegram
+calls are answered locally by a stub session; rate limiters still apply.
+"""
+
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import logging
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, get_args, get_origin
+
+import aiosqlite
+from aiogram import BaseMiddleware, Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, ChatInviteLink, Message, MessageId, TelegramObject, Update, User
+
+from config import settings
+
+# Replays must not append to the log they read, nor write real backups
+settings.RECORD_UPDATES = ""
+
+from bot import bots, dp, update_queue  # noqa: E402
+from bot.middlewares.recorder import read_records  # noqa: E402
+from database import close_all, get_db  # noqa: E402
+from main import init_tenant, setup_dispatcher  # noqa: E402
+from services.admin_service import ensure_admins  # noqa: E402
+from services.broadcast_service import running_broadcasts  # noqa: E402
+from utils.tenancy import tenant_scope  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Name of the handler running in the current task, for statement counting
+_current_handler: ContextVar[Optional[str]] = ContextVar("replay_handler", default=None)
+
+
+class ReplaySession(BaseSession):
+    """Bot session answering every API call locally with a plausible result."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls: Counter = Counter()
+        self._last_id = 0
+
+    def _next_id(self) -> int:
+        self._last_id += 1
+        return self._last_id
+
+    async def make_request(self, bot: Bot, method: Any, timeout: Optional[int] = None) -> Any:
+        self.calls[type(method).__name__] += 1
+        returning = method.__returning__
+        if get_origin(returning) is list:
+            return [MessageId(message_id=self._next_id()) for _ in getattr(method, "message_ids", [])]
+        options = get_args(returning) or (returning,)
+        me = User(id=bot.id, is_bot=True, first_name="Replay")
+        if Message in options:
+            chat_id = getattr(method, "chat_id", None)
+            return Message(
+                message_id=self._next_id(),
+                date=datetime.datetime.now(datetime.timezone.utc),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                from_user=me,
+                text=getattr(method, "text", None),
+            )
+        if MessageId in options:
+            return MessageId(message_id=self._next_id())
+        if ChatInviteLink in options:
+            return ChatInviteLink(
+                invite_link=f"https://t.me/+replay{self._next_id()}",
+                creator=me,
+                creates_join_request=False,
+                is_primary=False,
+                is_revoked=False,
+                expire_date=getattr(method, "expire_date", None),
+                member_limit=getattr(method, "member_limit", None),
+            )
+        if User in options:
+            return me
+        return True
+
+    async def stream_content(self, *args: Any, **kwargs: Any) -> Any:
+        yield b""
+
+    async def close(self) -> None:
+        return None
+
+
+class ReplayStats(BaseMiddleware):
+    """Inner middleware timing handlers and counting the SQL they run."""
+
+    def __init__(self) -> None:
+        self.latency: dict[str, list[float]] = defaultdict(list)
+        self.wait: dict[str, list[float]] = defaultdict(list)
+        self.statements: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.fed_at: dict[int, float] = {}
+        self._thread = threading.local()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        target = data.get("handler")
+        callback = getattr(target, "callback", None)
+        name = (
+            f"{callback.__module__.removeprefix('handlers.')}.{callback.__qualname__}"
+            if callback is not None
+            else "?"
+        )
+        started = time.perf_counter()
+        fed_at = self.fed_at.pop(id(data.get("event_update")), None)
+        if fed_at is not None:
+            self.wait[name].append(started - fed_at)
+        token = _current_handler.set(name)
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors[name] += 1
+            raise
+        finally:
+            self.latency[name].append(time.perf_counter() - started)
+            _current_handler.reset(token)
+
+    async def watch(self, db: aiosqlite.Connection) -> None:
+        """Count statements run on ``db`` against the handler that queued them."""
+        execute = db._execute
+        local = self._thread
+
+        async def labelled_execute(fn: Callable, *args: Any, **kwargs: Any) -> Any:
+            name = _current_handler.get()
+
+            def call() -> Any:
+                local.name = name
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    local.name = None
+
+            return await execute(call)
+
+        def trace(statement: str) -> None:
+            name = getattr(local, "name", None)
+            # Statements run by triggers are reported with a leading comment
+            if name is not None and not statement.startswith("--"):
+                self.statements[name] += 1
+
+        await execute(db._conn.set_trace_callback, trace)
+        db._execute = labelled_execute
+
+
+def _percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def _copy_seed(seed: Path, target: str) -> None:
+    if seed.suffix == ".gz":
+        with gzip.open(seed, "rb") as src, open(target, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+    else:
+        shutil.copyfile(seed, target)
+
+
+def _parse_seeds(values: list[str]) -> dict[Optional[str], Path]:
+    """Map ``tenant=path`` values to their tenant and bare paths to None (every tenant)."""
+    seeds: dict[Optional[str], Path] = {}
+    for value in values:
+        tenant, sep, path = value.partition("=")
+        if sep and tenant and "/" not in tenant:
+            seeds[tenant] = Path(path)
+        else:
+            seeds[None] = Path(value)
+    return seeds
+
+
+def _sender_id(update: dict[str, Any]) -> Optional[int]:
+    for value in update.values():
+        if isinstance(value, dict) and isinstance(value.get("from"), dict):
+            return value["from"].get("id")
+    return None
+
+
+async def replay(
+    log: Path, speed: float, data_dir: Path, seeds: dict[Optional[str], Path]
+) -> dict[str, Any]:
+    """Feed ``log`` through the dispatcher and return the report.
+
+    ``seeds`` maps tenant names, or None for every other tenant, to the
+    database each one starts from.
+    """
+    settings.BACKUP_DIR = str(data_dir / "backups")
+    for tenant in settings.TENANTS:
+        tenant.DB_PATH = str(data_dir / f"{tenant.NAME}.sqlite3")
+        seed = seeds.get(tenant.NAME, seeds.get(None))
+        if seed is not None:
+            _copy_seed(seed, tenant.DB_PATH)
+    await asyncio.gather(*(init_tenant(tenant) for tenant in settings.TENANTS))
+
+    stats = ReplayStats()
+    for tenant in settings.TENANTS:
+        with tenant_scope(tenant.NAME):
+            await stats.watch(get_db())
+    session = ReplaySession()
+    for bot in bots.values():
+        bot.session = session
+    setup_dispatcher()
+    for name, observer in dp.observers.items():
+        if name in ("update", "error"):
+            continue
+        # Outermost, so time spent in the bot's own inner middlewares counts too
+        existing = list(observer.middleware)
+        for middleware in existing:
+            observer.middleware.unregister(middleware)
+        for middleware in [stats, *existing]:
+            observer.middleware(middleware)
+
+    # Recorded admins keep their role under their pseudonym
+    admins: dict[str, set[int]] = defaultdict(set)
+    for record in read_records(log):
+        sender = _sender_id(record["update"])
+        if record.get("admin") and sender is not None:
+            admins[record["tenant"]].add(sender)
+    for tenant, user_ids in admins.items():
+        if tenant in bots:
+            with tenant_scope(tenant):
+                await ensure_admins(sorted(user_ids))
+
+    fed = skipped = 0
+    first_ts: Optional[float] = None
+    started = time.perf_counter()
+    for record in read_records(log):
+        bot = bots.get(record["tenant"])
+        if bot is None:
+            skipped += 1
+            continue
+        if first_ts is None:
+            first_ts = record["ts"]
+        if speed > 0:
+            delay = started + (record["ts"] - first_ts) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        update = Update.model_validate(record["update"], context={"bot": bot})
+        stats.fed_at[id(update)] = time.perf_counter()
+        await dp.feed_update(bot, update)
+        fed += 1
+    while update_queue.stats()["in_flight"] or update_queue.stats()["queued"] or running_broadcasts:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await close_all()
+
+    handlers = {
+        name: {
+            "calls": len(values),
+            "p50_ms": _percentile(values, 0.5) * 1000,
+            "p90_ms": _percentile(values, 0.9) * 1000,
+            "p99_ms": _percentile(values, 0.99) * 1000,
+            "max_ms": max(values) * 1000,
+            "wait_p50_ms": _percentile(stats.wait[name], 0.5) * 1000 if stats.wait[name] else 0.0,
+            "queries_per_call": stats.statements[name] / len(values),
+            "errors": stats.errors[name],
+        }
+        for name, values in sorted(stats.latency.items())
+    }
+    handled = sum(h["calls"] for h in handlers.values())
+    return {
+        "log": str(log),
+        "speed": speed,
+        "updates": fed,
+        "skipped": skipped,
+        "unhandled": fed - handled,
+        "failed": update_queue.stats()["failed"],
+        "elapsed_s": elapsed,
+        "api_calls": dict(session.calls.most_common()),
+        "handlers": handlers,
+    }
+
+
+def print_report(report: dict[str, Any]) -> None:
+    print(
+        f"{report['updates']} updates in {report['elapsed_s']:.2f}s "
+        f"(speed {report['speed'] or 'max'}), {report['unhandled']} unhandled, "
+        f"{report['failed']} failed, {report['skipped']} from unknown tenants"
+    )
+    print(
+        f"{'handler':<40} {'calls':>6} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} "
+        f"{'max ms':>8} {'wait ms':>8} {'queries':>8}"
+    )
+    for name, h in report["handlers"].items():
+        print(
+            f"{name:<40} {h['calls']:>6} {h['p50_ms']:>8.2f} {h['p90_ms']:>8.2f} "
+            f"{h['p99_ms']:>8.2f} {h['max_ms']:>8.2f} {h['wait_p50_ms']:>8.2f} "
+            f"{h['queries_per_call']:>8.1f}"
+        )
+    print("API calls: " + ", ".join(f"{k} {v}" for k, v in report["api_calls"].items()))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("log", type=Path, help="log written with RECORD_UPDATES")
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="time compression, 0 for as fast as possible"
+    )
+    parser.add_argument(
+        "--seed",
+        action="append",
+        default=[],
+        metavar="[TENANT=]PATH",
+        help="database (e.g. a backup, may be .gz) to start from, for one tenant or all; "
+        "repeatable. Seeded users keep their real IDs and never match the log's pseudonyms",
+    )
+    parser.add_argument("--data-dir", type=Path, help="where replay databases go (temporary)")
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+    seeds = _parse_seeds(args.seed)
+    known = {tenant.NAME for tenant in settings.TENANTS}
+    for tenant, path in seeds.items():
+        if tenant is not None and tenant not in known:
+            parser.error(f"--seed: unknown tenant {tenant!r}")
+        if not path.is_file():
+            parser.error(f"--seed: {path} does not exist")
+
+    logging.basicConfig(level=logging.WARNING)
+    data_dir = args.data_dir or Path(tempfile.mkdtemp(prefix="replay-"))
+    data_dir.mkdir(parents=True, exist_ok=True)
+    report = asyncio.run(replay(args.log, args.speed, data_dir, seeds))
+    print_report(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+    if args.data_dir is None:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,63 @@
 import asyncio
 import datetime
+import logging
 
 from aiogram.exceptions import TelegramAPIError
 
-from bot import bot, messages
-from database import get_db
-from services.subscription_service import remove_subscription
+from bot import get_bot, messages
+from config import settings
+from services.enforcement_service import queue_kick
+from services.subscription_service import (
+    EVENT_EXPIRED,
+    list_expiring_subscriptions,
+    remove_subscription,
+)
 from services.config_service import get_config
+from utils.tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
 
 
 async def _check_subscriptions() -> None:
     """Check all subscriptions and notify users or remove access."""
-    db = get_db()
     now = datetime.datetime.utcnow()
     tomorrow = now + datetime.timedelta(days=1)
     reminder_msg = await get_config("reminder_msg") or messages.DEFAULT_REMINDER_MSG
     expiration_msg = (
         await get_config("expiration_msg") or messages.DEFAULT_EXPIRATION_MSG
     )
-    async with db.execute("SELECT user_id, end_date FROM subscription") as cursor:
-        rows = await cursor.fetchall()
-
-    for row in rows:
-        user_id = int(row["user_id"])
-        end_date = datetime.datetime.fromisoformat(row["end_date"])
+    for sub in await list_expiring_subscriptions(tomorrow):
+        user_id = sub.user_id
+        end_date = sub.end_date
 
         if now < end_date <= tomorrow:
             # Notify user subscription expires in one day
             try:
-                await bot.send_message(user_id, reminder_msg)
+                await get_bot().send_message(user_id, reminder_msg)
             except TelegramAPIError:
                 pass
         elif end_date <= now:
-            await remove_subscription(user_id)
+            # Queue the kick first so a crash can't drop it; the next run
+            # finds the subscription again if removing it didn't happen
+            channel_id = settings.current.CHANNEL_ID
+            if channel_id is not None:
+                await queue_kick(user_id, channel_id)
+            await remove_subscription(user_id, event=EVENT_EXPIRED)
             try:
-                await bot.send_message(user_id, expiration_msg)
+                await get_bot().send_message(user_id, expiration_msg)
             except TelegramAPIError:
                 pass
 
 
 async def monitor_subscriptions() -> None:
-    """Background task that runs once every 24 hours."""
+    """Background task that checks every tenant once every 24 hours."""
     while True:
-        await _check_subscriptions()
+        for tenant in settings.TENANTS:
+            with tenant_scope(tenant.NAME):
+                try:
+                    await _check_subscriptions()
+                except Exception:
+                    logger.exception("Subscription check failed for %s", tenant.NAME)
         await asyncio.sleep(24 * 60 * 60)
 
 
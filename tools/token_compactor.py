@@ -0,0 +1,38 @@
+import asyncio
+import datetime
+import logging
+
+from config import settings
+from database import incremental_vacuum
+from services.token_service import compact_tokens
+from utils.tenancy import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+CHECK_INTERVAL = 6 * 60 * 60
+# Free pages returned to the OS per vacuum step
+VACUUM_PAGES = 500
+
+
+async def _compact_tenant() -> None:
+    deleted = await compact_tokens(datetime.timedelta(days=settings.TOKEN_RETENTION_DAYS))
+    # Reclaim the space a few hundred pages at a time, stopping if a step
+    # makes no progress
+    free, previous = await incremental_vacuum(VACUUM_PAGES), None
+    while free and free != previous:
+        await asyncio.sleep(0)
+        free, previous = await incremental_vacuum(VACUUM_PAGES), free
+    if deleted:
+        logger.info("Token compaction %s: %d deleted", settings.current.NAME, deleted)
+
+
+async def compact_token_table() -> None:
+    """Background task keeping every tenant's token table and file size bounded."""
+    while True:
+        for tenant in settings.TENANTS:
+            with tenant_scope(tenant.NAME):
+                try:
+                    await _compact_tenant()
+                except Exception:
+                    logger.exception("Token compaction failed for %s", tenant.NAME)
+        await asyncio.sleep(CHECK_INTERVAL)
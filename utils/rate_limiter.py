@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+from utils.tenancy import current_tenant
+
+__all__ = ["RateLimiter", "TenantRateLimiter", "telegram_limiter"]
+
+
+class RateLimiter:
+    """Space out calls so at most ``rate`` happen every ``per`` seconds.
+
+    Each ``acquire`` reserves the next free slot and sleeps until it, so
+    concurrent callers are served in order without a lock.
+    """
+
+    def __init__(self, rate: float, per: float = 1.0) -> None:
+        self._interval = per / rate
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self._interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def penalize(self, seconds: float) -> None:
+        """Hold back every caller for ``seconds``, e.g. after a 429 response."""
+        self._next = max(self._next, time.monotonic() + seconds)
+
+    async def __aenter__(self) -> "RateLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+
+class TenantRateLimiter:
+    """A separate :class:`RateLimiter` for each tenant, i.e. each bot token.
+
+    Telegram's limits apply per bot, so one tenant's broadcast must not
+    slow down, or be penalized for, another's.
+    """
+
+    def __init__(self, rate: float, per: float = 1.0) -> None:
+        self._rate = rate
+        self._per = per
+        self._limiters: dict[str, RateLimiter] = {}
+
+    @property
+    def current(self) -> RateLimiter:
+        """The current tenant's limiter."""
+        tenant = current_tenant.get()
+        limiter = self._limiters.get(tenant)
+        if limiter is None:
+            limiter = self._limiters[tenant] = RateLimiter(self._rate, self._per)
+        return limiter
+
+    async def acquire(self) -> None:
+        await self.current.acquire()
+
+    def penalize(self, seconds: float) -> None:
+        """Hold back the current tenant's callers for ``seconds``."""
+        self.current.penalize(seconds)
+
+    async def __aenter__(self) -> RateLimiter:
+        return await self.current.__aenter__()
+
+    async def __aexit__(self, *exc: object) -> None:
+        return None
+
+
+# Shared by everything that sends messages; Telegram allows each bot ~30 per second
+telegram_limiter = TenantRateLimiter(25, 1.0)
@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+__all__ = ["DEFAULT_TENANT", "current_tenant", "tenant_scope"]
+
+# Name used when the process runs a single bot configured from BOT_TOKEN
+DEFAULT_TENANT = "default"
+
+# Tenant whose bot, database and caches the running code works with
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+
+@contextmanager
+def tenant_scope(name: str) -> Iterator[None]:
+    """Run the enclosed block on behalf of tenant ``name``."""
+    token = current_tenant.set(name)
+    try:
+        yield
+    finally:
+        current_tenant.reset(token)